@@ -0,0 +1,54 @@
+"""Compare sentence splitters on a document: speed and agreement with Punkt.
+
+Usage (from the repository root):
+    PYTHONPATH=src/upload python -m scripts.benchmark_sentence_splitters path/to/text.md [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from domain.chunker.sentence import BaseSentenceSplitter
+from domain.chunker.sentence import PunktSentenceSplitter
+from domain.chunker.sentence import RegexSentenceSplitter
+
+
+def benchmark(splitter: BaseSentenceSplitter, text: str, repeat: int) -> tuple:
+    splitter.span_tokenize(text[:1000])  # load models outside the timing
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        spans = splitter.span_tokenize(text)
+    return spans, (time.perf_counter() - start_time) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='UTF-8 text or Markdown file')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.path, encoding='utf-8') as f:
+        text = f.read()
+
+    results = {
+        'punkt': benchmark(PunktSentenceSplitter(), text, args.repeat),
+        'regex': benchmark(RegexSentenceSplitter(), text, args.repeat),
+    }
+    reference = {end for _, end in results['punkt'][0]}
+
+    print(f'{len(text)} characters, {args.repeat} runs')
+    print(f'{"splitter":<10}{"sentences":>12}{"ms/run":>12}{"MB/s":>10}{"boundary F1":>14}')
+    for name, (spans, seconds) in results.items():
+        ends = {end for _, end in spans}
+        common = len(ends & reference)
+        precision = common / len(ends) if ends else 0.0
+        recall = common / len(reference) if reference else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        print(
+            f'{name:<10}{len(spans):>12}{seconds * 1000:>12.1f}'
+            f'{len(text.encode()) / seconds / 1e6 if seconds else 0:>10.1f}{f1:>14.3f}',
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -37,6 +37,7 @@ def get_upload_application(request: Request) -> UploadDocumentApplication:
         parser=request.app.state.parser,
         chunker=request.app.state.chunker,
         embedder=request.app.state.embedder,
+        cache=request.app.state.extraction_cache,
     )
 
 
@@ -3,21 +3,24 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import os
+import textwrap
 import time
 from concurrent.futures import as_completed
 from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator
 from typing import List
 from typing import Optional
 
+from domain.chunker import Chunk
 from domain.chunker import ChunkerInput
 from domain.chunker import ChunkerService
 from domain.embedder import ChunkData
-from domain.embedder import EmbedderInput
 from domain.embedder import EmbedderOutput
 from domain.embedder import EmbedderService
-from domain.parser import ParserInput
 from domain.parser import ParserService
 from fastapi import UploadFile
+from infra.cache import ExtractionCache
 from pydantic import BaseModel
 from shared.multiworker_config import get_optimal_worker_count
 from shared.multiworker_config import MultiWorkerConfig
@@ -69,10 +72,12 @@ class UploadDocumentApplication:
         parser: ParserService,
         chunker: ChunkerService,
         embedder: EmbedderService,
+        cache: Optional[ExtractionCache] = None,
     ):
         self.parser = parser
         self.chunker = chunker
         self.embedder = embedder
+        self.cache = cache
 
     async def upload_document(self, input_data: UploadDocumentInput, session_id: Optional[str] = None) -> UploadDocumentOutput:
         """Upload a document and process it through parsing, chunking, and embedding."""
@@ -84,39 +89,39 @@ class UploadDocumentApplication:
         try:
             logger.info(f'Starting document upload process for file: {input_data.file.filename}')
 
-            logger.info('Step 1: Parsing document...')
-            parser_input = ParserInput(file=input_data.file)
-            parser_output = await self.parser.process(parser_input)
-
-            with open(f'text_{input_data.file.filename}.md', 'w', encoding='utf-8') as f:
-                f.write(parser_output.raw_text)
+            cache_key = self.cache.key_for(input_data.file.file) if self.cache else None
 
+            _, file_extension = os.path.splitext(input_data.file.filename.lower())
             file_metadata = {
-                'filename': parser_output.filename,
-                'file_extension': parser_output.file_extension,
+                'filename': input_data.file.filename,
+                'file_extension': file_extension,
                 'upload_timestamp': time.time(),
             }
 
-            logger.info('Step 2: Chunking document...')
-            chunker_input = ChunkerInput(
-                text=str(parser_output.raw_text),
-                metadata=file_metadata,
-            )
-            chunker_output = self.chunker.process(chunker_input)
-            chunks_json = [
-                chunk.model_dump(mode='json') for chunk in chunker_output.chunks
-            ]
-            with open(f'chunks_{input_data.file.filename}.json', 'w', encoding='utf-8') as f:
-                f.write(json.dumps(chunks_json, indent=2, ensure_ascii=False))
-            processed_chunks = len(chunker_output.chunks)
+            chunks: AsyncIterator[Chunk]
+            cached_chunks = self._get_cached_chunks(cache_key, input_data.file.filename)
+            if cached_chunks is None:
+                logger.info('Step 1: Parsing document...')
+                raw_text = await self._parse_document(input_data.file, cache_key)
 
-            logger.info(f'Created {processed_chunks} chunks')
+                with open(f'text_{input_data.file.filename}.md', 'w', encoding='utf-8') as f:
+                    f.write(raw_text)
 
-            logger.info('Step 3: Generating embeddings...')
-            try:
+                logger.info('Step 2: Chunking document...')
+                chunker_input = ChunkerInput(
+                    text=raw_text,
+                    metadata=file_metadata,
+                )
+                chunks = self._chunk_document(chunker_input, cache_key)
+            else:
+                logger.info('Steps 1-2: Reusing cached chunks')
+                chunks = self._iter_list(cached_chunks)
+
+            async def _to_chunk_data() -> AsyncIterator[ChunkData]:
                 # Convert Chunk objects to ChunkData objects for the embedder
-                chunk_data_list = []
-                for chunk in chunker_output.chunks:
+                nonlocal processed_chunks
+                async for chunk in chunks:
+                    processed_chunks += 1
                     chunk_data = ChunkData(
                         id=str(chunk.id),
                         content=chunk.content,
@@ -127,20 +132,28 @@ class UploadDocumentApplication:
                         type=chunk.type,
                         content_json=chunk.content_json,
                         heading_level=chunk.heading_level,
+                        start=chunk.start,
+                        end=chunk.end,
+                        section_path=chunk.section_path,
+                        content_hash=chunk.content_hash,
+                        near_duplicate_of=chunk.near_duplicate_of,
                     )
-                    chunk_data_list.append(chunk_data)
+                    # Shares the document buffer, content is sliced out only when embedded
+                    chunk_data.attach_source(chunk.source)
+                    yield chunk_data
 
-                embedder_input = EmbedderInput(
-                    chunks=chunk_data_list,
-                    metadata=file_metadata,
-                )
-                embedder_output = await self.embedder.process(embedder_input)
+            logger.info('Step 3: Generating embeddings...')
+            try:
+                # Chunks are embedded while later sections are still being chunked
+                embedder_output = await self.embedder.process_stream(_to_chunk_data())
+                logger.info(f'Created {processed_chunks} chunks')
 
                 if embedder_output.index_name:
-                    embeddings_created = len(chunk_data_list)
+                    embeddings_created = embedder_output.num_embeddings or 0
                     logger.info(f'Created {embeddings_created} embeddings and indexed to {embedder_output.index_name}')
                 else:
                     embeddings_created = 0
+                    status = 'failed'
                     logger.warning('Failed to create embeddings or index')
 
             except Exception as e:
@@ -175,6 +188,62 @@ class UploadDocumentApplication:
                 filename=input_data.file.filename,
             )
 
+    async def _parse_document(self, file: UploadFile, cache_key: Optional[str]) -> str:
+        """Extract and structure the document, reusing cached stage outputs when available."""
+        if cache_key:
+            markdown = self.cache.get(cache_key, 'markdown')
+            if markdown is not None:
+                return markdown
+
+        extracted_text = self.cache.get(cache_key, 'extracted') if cache_key else None
+        if extracted_text is None:
+            extracted_text = self.parser.extract_text(file)
+            if cache_key:
+                self.cache.put(cache_key, 'extracted', extracted_text)
+
+        markdown = await self.parser.generate_markdown(extracted_text)
+        if cache_key:
+            self.cache.put(cache_key, 'markdown', markdown)
+        return markdown
+
+    async def _chunk_document(self, chunker_input: ChunkerInput, cache_key: Optional[str]) -> AsyncIterator[Chunk]:
+        """Stream chunks while writing the debug JSON dump, caching them once chunking completes."""
+        filename = chunker_input.metadata['filename']
+        chunks_json = [] if cache_key else None
+
+        with open(f'chunks_{filename}.json', 'w', encoding='utf-8') as f:
+            # Same layout as json.dumps(chunks, indent=2), written one chunk at a time
+            f.write('[')
+            separator = '\n'
+            async for chunk in self.chunker.aiter_process(chunker_input):
+                chunk_json = {**chunk.model_dump(mode='json'), 'content': chunk.text}
+                f.write(separator + textwrap.indent(json.dumps(chunk_json, indent=2, ensure_ascii=False), '  '))
+                separator = ',\n'
+                if chunks_json is not None:
+                    chunks_json.append(chunk_json)
+                yield chunk
+            f.write('\n]' if separator != '\n' else ']')
+
+        if chunks_json is not None:
+            self.cache.put(cache_key, 'chunks', json.dumps(chunks_json, ensure_ascii=False))
+
+    @staticmethod
+    async def _iter_list(chunks: List[Chunk]) -> AsyncIterator[Chunk]:
+        for chunk in chunks:
+            yield chunk
+
+    def _get_cached_chunks(self, cache_key: Optional[str], filename: str) -> Optional[List[Chunk]]:
+        """Load cached chunks for the document, relabelled with the uploaded filename."""
+        if not cache_key:
+            return None
+        cached = self.cache.get(cache_key, 'chunks')
+        if cached is None:
+            return None
+        return [
+            Chunk.model_validate({**chunk, 'filename': filename})
+            for chunk in json.loads(cached)
+        ]
+
     def upload_multiple_documents(self, input_data: UploadMultipleDocumentsInput) -> UploadMultipleDocumentsOutput:
         """Upload and process multiple documents using multi-worker processing."""
         start_time = time.time()
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 from .base import BaseChunkerService
+from .base import Chunk
 from .base import ChunkerInput
 from .base import ChunkerOutput
 from .service import ChunkerService
 
 __all__ = [
     'BaseChunkerService',
+    'Chunk',
     'ChunkerInput',
     'ChunkerOutput',
     'ChunkerService',
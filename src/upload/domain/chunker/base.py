@@ -7,12 +7,19 @@ from typing import List
 from typing import Optional
 
 from pydantic import BaseModel
+from shared.model import SourceTextModel
 
 
-class Chunk(BaseModel):
-    """Represents a chunk of text."""
+class Chunk(SourceTextModel):
+    """Represents a chunk of text.
+
+    ``start``/``end`` are character offsets into the chunked document. ``content`` is
+    only set when the chunk text differs from that slice (e.g. reformatted tables).
+    ``near_duplicate_of`` is the ``content_hash`` of a near-identical chunk seen
+    earlier, in this document or a previous one, whose vector can be reused.
+    """
     id: int
-    content: str
+    content: Optional[str] = None
     filename: str
     section_title: str
     type: Optional[str] = None
@@ -20,6 +27,11 @@ class Chunk(BaseModel):
     tokens: Optional[int] = None
     content_json: Optional[List[Dict[str, str]]] = None
     heading_level: Optional[int] = None
+    start: Optional[int] = None
+    end: Optional[int] = None
+    section_path: Optional[List[str]] = None
+    content_hash: Optional[str] = None
+    near_duplicate_of: Optional[str] = None
 
 
 class ChunkerInput(BaseModel):
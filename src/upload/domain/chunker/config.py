@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Token counting: a HuggingFace `tokenizer.json` matching the embedding model, or the
+# word-count heuristic when unset
+CHUNKER_TOKENIZER_PATH = os.getenv('CHUNKER_TOKENIZER_PATH') or None
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '100000'))  # 0 disables the cache
+
+# Parallel chunking of the sections of one document, 0 chunks sections serially
+CHUNKER_SECTION_WORKERS = int(os.getenv('CHUNKER_SECTION_WORKERS', '0'))
+CHUNKER_SECTION_EXECUTOR = os.getenv('CHUNKER_SECTION_EXECUTOR', 'process').lower()  # 'thread' or 'process'
+
+# Sentence splitting: 'punkt' (NLTK data baked into the image) or 'regex' (no data needed)
+CHUNKER_SENTENCE_SPLITTER = os.getenv('CHUNKER_SENTENCE_SPLITTER', 'punkt').lower()
+CHUNKER_SENTENCE_LANGUAGE = os.getenv('CHUNKER_SENTENCE_LANGUAGE', 'english')
+
+# Near-duplicate detection: MinHash signatures of every chunk kept in a local SQLite index.
+# Near-duplicates within a document are dropped, across documents they are flagged so the
+# embedder can reuse the vector already indexed for the earlier chunk
+NEAR_DUPLICATE_ENABLED = os.getenv('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true'
+NEAR_DUPLICATE_INDEX_PATH = os.getenv('NEAR_DUPLICATE_INDEX_PATH', '.cache/near_duplicates.sqlite3')
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.8'))  # estimated Jaccard of word 3-shingles
+NEAR_DUPLICATE_MIN_SHINGLES = int(os.getenv('NEAR_DUPLICATE_MIN_SHINGLES', '8'))  # shorter chunks are not compared
+NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv('NEAR_DUPLICATE_MAX_ENTRIES', '1000000'))  # oldest signatures are evicted
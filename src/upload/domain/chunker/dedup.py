@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import List
+from typing import Optional
+
+import numpy as np
+
+from .config import NEAR_DUPLICATE_INDEX_PATH
+from .config import NEAR_DUPLICATE_MAX_ENTRIES
+from .config import NEAR_DUPLICATE_MIN_SHINGLES
+from .config import NEAR_DUPLICATE_THRESHOLD
+
+WORD_PATTERN = re.compile(r'\w+')
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs above ~0.5 Jaccard share a band with high probability
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Evict down to this fraction of the cap, checked every EVICTION_CHECK_INTERVAL inserts
+EVICTION_TARGET = 0.9
+EVICTION_CHECK_INTERVAL = 1000
+
+_rng = np.random.default_rng(0x5EED)
+# Multiply-shift hash family over 32-bit shingle hashes, fixed so signatures persist
+_PERM_A = _rng.integers(1, 1 << 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def minhash(text: str, min_shingles: int = NEAR_DUPLICATE_MIN_SHINGLES) -> Optional[np.ndarray]:
+    """MinHash signature of the word 3-shingles, or None when the text is too short to compare."""
+    words = WORD_PATTERN.findall(text.lower())
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    if len(shingles) < min_shingles:
+        return None
+
+    hashes = np.frombuffer(
+        b''.join(hashlib.blake2b(shingle.encode(), digest_size=4).digest() for shingle in shingles),
+        dtype=np.uint32,
+    ).astype(np.uint64)
+    # (shingles x permutations), uint64 arithmetic wraps as the hash family expects
+    permuted = (hashes[:, None] * _PERM_A + _PERM_B) >> np.uint64(32)
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def band_keys(signature: np.ndarray) -> List[int]:
+    """One signed 64-bit key per band, as stored by SQLite."""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            'big', signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+@dataclass
+class NearDuplicate:
+    """An earlier chunk close enough to the queried one."""
+    content_hash: str
+    document: str
+    similarity: float
+
+
+class NearDuplicateIndex:
+    """MinHash signatures of every chunk seen, persisted in a local SQLite file.
+
+    Candidates are looked up by exact match on any band key (LSH) and confirmed by
+    estimated Jaccard similarity, so lookups stay index scans as the corpus grows.
+    Past ``max_entries`` signatures the oldest are evicted, which also retires those
+    of documents deleted since; a stale match only costs the embedder a lookup.
+    """
+
+    def __init__(
+        self,
+        path: str = NEAR_DUPLICATE_INDEX_PATH,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        max_entries: int = NEAR_DUPLICATE_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            # A lost tail of fingerprints only costs a few extra embeddings
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS signatures ('
+                'content_hash TEXT PRIMARY KEY, document TEXT, signature BLOB)',
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS bands ('
+                'band INTEGER, key INTEGER, content_hash TEXT, PRIMARY KEY (band, key, content_hash))',
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS bands_content_hash ON bands (content_hash)')
+
+    def find(self, signature: np.ndarray) -> Optional[NearDuplicate]:
+        """Most similar indexed chunk at or above the threshold."""
+        keys = band_keys(signature)
+        where = ' OR '.join(['(band = ? AND key = ?)'] * BANDS)
+        params = [value for band, key in enumerate(keys) for value in (band, key)]
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT content_hash, document, signature FROM signatures WHERE content_hash IN '
+                f'(SELECT content_hash FROM bands WHERE {where})',
+                params,
+            ).fetchall()
+
+        best: Optional[NearDuplicate] = None
+        for hash_, document, blob in rows:
+            score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best.similarity):
+                best = NearDuplicate(hash_, document, score)
+        return best
+
+    def add(self, signature: np.ndarray, hash_: str, document: str) -> None:
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                'INSERT OR IGNORE INTO signatures VALUES (?, ?, ?)',
+                (hash_, document, signature.tobytes()),
+            ).rowcount
+            if inserted:
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO bands VALUES (?, ?, ?)',
+                    [(band, key, hash_) for band, key in enumerate(band_keys(signature))],
+                )
+                self._inserts += 1
+                if self._inserts % EVICTION_CHECK_INTERVAL == 0:
+                    self._evict()
+
+    def _evict(self) -> None:
+        count = self._conn.execute('SELECT COUNT(*) FROM signatures').fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # Signatures get increasing rowids, so the lowest are the oldest
+        evict_count = count - int(self.max_entries * EVICTION_TARGET)
+        oldest = 'SELECT content_hash FROM signatures ORDER BY rowid LIMIT ?'
+        self._conn.execute(f'DELETE FROM bands WHERE content_hash IN ({oldest})', (evict_count,))
+        self._conn.execute(f'DELETE FROM signatures WHERE content_hash IN ({oldest})', (evict_count,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
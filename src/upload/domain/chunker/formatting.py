@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import re
+from abc import ABC
+from abc import abstractmethod
+from dataclasses import dataclass
+from functools import cached_property
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+
+BULLET_PREFIXES = ('- ', '• ')
+TABLE_HEADER = ['| Thông tin | Chi tiết |', '| --- | --- |']
+ADDRESS_KEYWORDS = ('địa chỉ', 'số nhà', 'phường', 'quận', 'tỉnh', 'thành phố')
+ADDRESS_FIELDS = ('Số nhà/Đường', 'Phường/Xã', 'Quận/Huyện', 'Tỉnh/Thành phố', 'Mã bưu chính')
+
+
+@dataclass(slots=True)
+class Bullet:
+    """A ``- `` or ``• `` line; ``value`` is None when the item has no ``key: value`` form."""
+    key: str
+    value: Optional[str]
+
+
+class FormattingContext:
+    """A chunk classified line by line once, shared by every rule.
+
+    Keyword matches are only computed when a rule that needs them is considered.
+    """
+
+    def __init__(self, content: str, keyword_pattern: Optional[re.Pattern]):
+        self.content = content
+        self.bullets: List[Bullet] = []
+        self._keyword_pattern = keyword_pattern
+
+        for line in content.strip().split('\n'):
+            line = line.strip()
+            if line.startswith(BULLET_PREFIXES):
+                item = line[2:].strip()
+                if ':' in item:
+                    key, value = item.split(':', 1)
+                    self.bullets.append(Bullet(key.strip(), value.strip()))
+                else:
+                    self.bullets.append(Bullet(item, None))
+
+    @cached_property
+    def matched_rules(self) -> Set[str]:
+        """Names of the rules with at least one keyword in the content, from a single scan."""
+        matched: Set[str] = set()
+        if self._keyword_pattern is None:
+            return matched
+        rule_count = len(self._keyword_pattern.groupindex)
+        for match in self._keyword_pattern.finditer(self.content):
+            matched.add(match.lastgroup)
+            if len(matched) == rule_count:
+                break
+        return matched
+
+
+class FormattingRule(ABC):
+    """Rewrites a chunk when it has at least ``min_bullets`` bullets and, if
+    ``keywords`` are set, mentions one of them (case-insensitive)."""
+
+    name: str = ''
+    keywords: Tuple[str, ...] = ()
+    min_bullets: int = 0
+
+    def applies(self, context: FormattingContext) -> bool:
+        if len(context.bullets) < self.min_bullets:
+            return False
+        return not self.keywords or self.name in context.matched_rules
+
+    @abstractmethod
+    def apply(self, context: FormattingContext) -> str:
+        raise NotImplementedError()
+
+
+class AddressTableRule(FormattingRule):
+    """Address bullets and the remaining ``key: value`` bullets as two tables."""
+
+    name = 'address'
+    keywords = ADDRESS_KEYWORDS
+    min_bullets = 3
+
+    def apply(self, context: FormattingContext) -> str:
+        address_items = []
+        other_items = []
+        for bullet in context.bullets:
+            if bullet.value is None:
+                continue
+            if any(field in bullet.key for field in ADDRESS_FIELDS):
+                address_items.append(bullet)
+            else:
+                other_items.append(bullet)
+
+        result = []
+        if address_items:
+            result.append('**Địa chỉ:**')
+            result.extend(TABLE_HEADER)
+            result.extend(f'| {item.key} | {item.value} |' for item in address_items)
+            result.append('')
+
+        if other_items:
+            result.append('**Thông tin bổ sung:**')
+            result.extend(TABLE_HEADER)
+            result.extend(f'| {item.key} | {item.value} |' for item in other_items)
+
+        return '\n'.join(result)
+
+
+class BulletTableRule(FormattingRule):
+    """Bullet lists as a two-column key/value table."""
+
+    name = 'bullets'
+    min_bullets = 3
+
+    def apply(self, context: FormattingContext) -> str:
+        if len(context.bullets) < self.min_bullets:
+            return context.content
+        table_lines = list(TABLE_HEADER)
+        table_lines.extend(f"| {item.key} | {item.value or ''} |" for item in context.bullets)
+        return '\n'.join(table_lines)
+
+
+class ContentFormatter:
+    """Applies the first matching rule to a chunk, in rule order.
+
+    The keywords of all rules are compiled into one case-insensitive alternation
+    with a named group per rule, so a chunk is scanned once whatever the number of
+    rules, and only when some keyword rule has enough bullets to apply.
+    """
+
+    def __init__(self, rules: Optional[Sequence[FormattingRule]] = None):
+        self.rules = list(rules) if rules is not None else [AddressTableRule(), BulletTableRule()]
+        self.keyword_pattern = self._compile_keywords(self.rules)
+        self.min_bullets = min((rule.min_bullets for rule in self.rules), default=0)
+
+    @staticmethod
+    def _compile_keywords(rules: Sequence[FormattingRule]) -> Optional[re.Pattern]:
+        groups = []
+        for rule in rules:
+            if rule.keywords:
+                # Longest first so a keyword is not shadowed by its own prefix
+                keywords = sorted(rule.keywords, key=len, reverse=True)
+                groups.append(f"(?P<{rule.name}>{'|'.join(map(re.escape, keywords))})")
+        return re.compile('|'.join(groups), re.IGNORECASE) if groups else None
+
+    def classify(self, content: str) -> FormattingContext:
+        return FormattingContext(content, self.keyword_pattern)
+
+    def format(self, content: str) -> str:
+        if self.min_bullets and '- ' not in content and '• ' not in content:
+            return content
+        context = self.classify(content)
+        if len(context.bullets) < self.min_bullets:
+            return content
+        for rule in self.rules:
+            if rule.applies(context):
+                return rule.apply(context)
+        return content
+
+    def rule(self, name: str) -> FormattingRule:
+        for rule in self.rules:
+            if rule.name == name:
+                return rule
+        raise KeyError(name)
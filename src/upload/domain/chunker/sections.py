@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from dataclasses import field
+from typing import List
+from typing import Optional
+
+# ATX heading: up to 3 spaces of indent, 1-6 '#', at least one space, then the title
+HEADING_PATTERN = re.compile(r' {0,3}(#{1,6})[ \t]+(\S.*)')
+FENCE_PATTERN = re.compile(r' {0,3}(`{3,}|~{3,})')
+
+
+@dataclass
+class Section:
+    """A heading and the text up to the next heading, as offsets into the document.
+
+    ``content_start``/``content_end`` bound the text between this heading line and the
+    next heading of any level; nested sections are reachable through ``children``.
+    """
+    title: str
+    level: int
+    path: List[str]
+    heading_start: int
+    content_start: int
+    content_end: int
+    parent: Optional[Section] = field(default=None, repr=False)
+    children: List[Section] = field(default_factory=list, repr=False)
+
+    def content(self, text: str) -> str:
+        return text[self.content_start:self.content_end]
+
+
+@dataclass
+class SectionTree:
+    """Heading tree of a Markdown document; ``sections`` lists every heading in document order."""
+    roots: List[Section]
+    sections: List[Section]
+
+
+def parse_sections(text: str) -> SectionTree:
+    """Build the heading tree in one line-oriented pass.
+
+    Only lines that start with an ATX heading count, so ``#`` inside table rows or
+    mid-sentence is ignored, as is anything inside fenced code blocks.
+    """
+    roots: List[Section] = []
+    sections: List[Section] = []
+    stack: List[Section] = []
+    fence: Optional[str] = None
+
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        line_start = offset
+        offset += len(line)
+        stripped = line.rstrip('\r\n')
+
+        fence_match = FENCE_PATTERN.match(stripped)
+        if fence_match:
+            marker = fence_match.group(1)
+            if fence is None:
+                fence = marker
+            elif marker[0] == fence[0] and len(marker) >= len(fence):
+                fence = None
+            continue
+        if fence is not None or not stripped.lstrip(' ').startswith('#'):
+            continue
+
+        heading = HEADING_PATTERN.match(stripped)
+        if not heading:
+            continue
+
+        level = len(heading.group(1))
+        title = heading.group(2).strip()
+        heading_start = line_start + heading.start(1)
+
+        if sections:
+            sections[-1].content_end = heading_start
+        while stack and stack[-1].level >= level:
+            stack.pop()
+
+        parent = stack[-1] if stack else None
+        section = Section(
+            title=title,
+            level=level,
+            path=(parent.path if parent else []) + [title],
+            heading_start=heading_start,
+            content_start=line_start + len(stripped),
+            content_end=len(text),
+            parent=parent,
+        )
+        (parent.children if parent else roots).append(section)
+        sections.append(section)
+        stack.append(section)
+
+    return SectionTree(roots=roots, sections=sections)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import re
+import threading
+from abc import ABC
+from abc import abstractmethod
+from typing import List
+from typing import Tuple
+
+from shared.logging import get_logger
+
+from .config import CHUNKER_SENTENCE_LANGUAGE
+from .config import CHUNKER_SENTENCE_SPLITTER
+
+logger = get_logger(__name__)
+
+Span = Tuple[int, int]
+
+# Upper-case Vietnamese letters beyond A-Z, spelled out: ranges like Ạ-Ỹ alternate
+# upper and lower case
+VIETNAMESE_UPPER = 'ÀÁÂÃÈÉÊÌÍÒÓÔÕÙÚÝĂĐĨŨƠƯẠẢẤẦẨẪẬẮẰẲẴẶẸẺẼẾỀỂỄỆỈỊỌỎỐỒỔỖỘỚỜỞỠỢỤỦỨỪỬỮỰỲỴỶỸ'
+# Terminal punctuation (plus closing quotes/brackets), whitespace, then something that can start
+# a sentence: an upper-case Latin/Vietnamese letter, a digit, an opening quote/bracket or a bullet
+SENTENCE_BOUNDARY_PATTERN = re.compile(
+    r'[.!?…]+["\'”’)\]]*'
+    rf'(?=\s+["\'“‘(\[]?([A-Z{VIETNAMESE_UPPER}0-9\-•]))',
+)
+# Tokens ending in a period that do not end a sentence
+ABBREVIATION_PATTERN = re.compile(
+    r'(?<!\S)(?:[A-ZĐ]|mr|mrs|ms|dr|st|vs|etc|e\.g|i\.e|tp|tx|q|p|v\.v|ths|ts|pgs|gs)\.$',
+    re.IGNORECASE,
+)
+# "No." only abbreviates when a number follows, otherwise it is the word "no"
+NUMBER_SIGN_PATTERN = re.compile(r'(?<!\S)no\.$', re.IGNORECASE)
+# A list or section marker ("1.", "2.3.", "IV.") alone on its line or after a sentence
+LIST_MARKER_PATTERN = re.compile(r'\s*(?:\d+(?:\.\d+)*|[IVXLC]+)')
+
+
+class BaseSentenceSplitter(ABC):
+    """Splits text into sentences, reported as character spans into the input."""
+
+    @abstractmethod
+    def span_tokenize(self, text: str) -> List[Span]:
+        raise NotImplementedError()
+
+    def split(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.span_tokenize(text)]
+
+
+class RegexSentenceSplitter(BaseSentenceSplitter):
+    """Rule-based Vietnamese/English splitter, no model or data files needed.
+
+    Breaks after terminal punctuation followed by whitespace and a sentence-like
+    start, skipping common abbreviations and single-letter initials.
+    """
+
+    def span_tokenize(self, text: str) -> List[Span]:
+        spans = []
+        start = 0
+        for match in SENTENCE_BOUNDARY_PATTERN.finditer(text):
+            if self.__continues(text, start, match):
+                continue
+            end = match.end()
+            self.__append(text, start, end, spans)
+            start = end
+        self.__append(text, start, len(text), spans)
+        return spans
+
+    def __continues(self, text: str, start: int, match: re.Match) -> bool:
+        """Whether the sentence goes on past this boundary."""
+        # Look back at the last token only
+        token_start = max(start, match.end() - 12)
+        if ABBREVIATION_PATTERN.search(text, token_start, match.start() + 1):
+            return True
+        if match.group(1).isdigit() and NUMBER_SIGN_PATTERN.search(text, token_start, match.start() + 1):
+            return True
+        # Keep a list marker with the text it numbers
+        line_start = text.rfind('\n', 0, match.start()) + 1
+        return LIST_MARKER_PATTERN.fullmatch(text, max(start, line_start), match.start()) is not None
+
+    def __append(self, text: str, start: int, end: int, spans: List[Span]) -> None:
+        # Trim surrounding whitespace like Punkt does
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+
+
+class PunktSentenceSplitter(BaseSentenceSplitter):
+    """NLTK Punkt, the model behind ``nltk.sent_tokenize``, loaded on first use.
+
+    The ``punkt_tab`` data is expected on the NLTK data path (it is baked into the
+    image at build time); nothing is downloaded at runtime. When it is missing the
+    splitter logs once and falls back to :class:`RegexSentenceSplitter`.
+    """
+
+    def __init__(self, language: str = CHUNKER_SENTENCE_LANGUAGE):
+        self.language = language
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_tokenizer'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get_tokenizer(self):
+        if self._tokenizer is None:
+            with self._lock:
+                if self._tokenizer is None:
+                    try:
+                        from nltk.tokenize import PunktTokenizer
+
+                        self._tokenizer = PunktTokenizer(self.language)
+                    except LookupError:
+                        logger.warning(
+                            'Punkt data not found, falling back to regex sentence splitting',
+                            language=self.language,
+                        )
+                        self._tokenizer = RegexSentenceSplitter()
+        return self._tokenizer
+
+    def span_tokenize(self, text: str) -> List[Span]:
+        return list(self._get_tokenizer().span_tokenize(text))
+
+
+def create_sentence_splitter(kind: str = CHUNKER_SENTENCE_SPLITTER) -> BaseSentenceSplitter:
+    if kind == 'punkt':
+        return PunktSentenceSplitter()
+    if kind == 'regex':
+        return RegexSentenceSplitter()
+    raise ValueError(f'Unsupported sentence splitter: {kind}')
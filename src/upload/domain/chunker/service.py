@@ -1,96 +1,261 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
-import math
-import re
+import threading
+from bisect import bisect_right
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from itertools import repeat
+from typing import AsyncIterator
 from typing import Dict
+from typing import Iterator
 from typing import List
-
-import nltk
+from typing import Optional
+from typing import Set
 
 from .base import BaseChunkerService
 from .base import Chunk
 from .base import ChunkerInput
 from .base import ChunkerOutput
-nltk.download('punkt')
-nltk.download('punkt_tab')
+from .config import CHUNKER_SECTION_EXECUTOR
+from .config import CHUNKER_SECTION_WORKERS
+from .config import NEAR_DUPLICATE_ENABLED
+from .dedup import minhash
+from .dedup import NearDuplicateIndex
+from .dedup import text_hash
+from .formatting import ContentFormatter
+from .sections import parse_sections
+from .sentence import BaseSentenceSplitter
+from .sentence import create_sentence_splitter
+from .table import MarkdownTable
+from .tokenizer import BaseTokenizer
+from .tokenizer import create_tokenizer
 
 
 class ChunkerService(BaseChunkerService):
     def __init__(self):
-        self.chunker = Chunker()
+        self.chunker = Chunker(
+            near_duplicates=NearDuplicateIndex() if NEAR_DUPLICATE_ENABLED else None,
+        )
+
+    def shutdown(self) -> None:
+        self.chunker.shutdown()
+        if self.chunker.near_duplicates is not None:
+            self.chunker.near_duplicates.close()
 
     def process(self, input_data: ChunkerInput) -> ChunkerOutput:
-        chunks = self.chunker.chunk_markdown_by_title_and_tokens(
+        return ChunkerOutput(
+            chunks=list(self.iter_process(input_data)),
+        )
+
+    def iter_process(self, input_data: ChunkerInput) -> Iterator[Chunk]:
+        """Chunk lazily, one heading section at a time."""
+        return self.chunker.iter_chunks(
             text=input_data.text,
             filename=input_data.metadata.get('filename', 'unknown'),
             min_heading_level=input_data.metadata.get('min_heading_level', 1),
         )
-        return ChunkerOutput(
-            chunks=chunks,
+
+    async def aiter_process(self, input_data: ChunkerInput) -> AsyncIterator[Chunk]:
+        """Async adapter over iter_process, chunking each section in a worker thread."""
+        sections = self.chunker.iter_section_chunks(
+            text=input_data.text,
+            filename=input_data.metadata.get('filename', 'unknown'),
+            min_heading_level=input_data.metadata.get('min_heading_level', 1),
         )
+        while True:
+            section_chunks = await asyncio.to_thread(next, sections, None)
+            if section_chunks is None:
+                return
+            for chunk in section_chunks:
+                yield chunk
+
+
+def _chunk_section(
+    chunker: Chunker, content: str, filename: str, section_title: str, heading_level: int, offset: int,
+) -> List[Chunk]:
+    """Module-level so sections can be chunked in a process pool."""
+    section_chunks = chunker.smart_chunk_section(content, filename, section_title, offset=offset)
+    for chunk in section_chunks:
+        chunk.heading_level = heading_level
+    return section_chunks
 
 
 class Chunker:
-    def __init__(self):
-        self.chunk_id = 0
+    """Splits Markdown into heading sections and sections into token-bounded chunks.
+
+    Chunk ids are a sequence scoped to the document being chunked, so concurrent
+    documents never share a counter. With ``section_workers`` sections are chunked in
+    parallel and reassembled in document order, giving the same ids as a serial run.
+
+    With a ``near_duplicates`` index, a chunk repeating an earlier chunk of the same
+    document word for word is dropped, and one close to a chunk seen before (earlier
+    in the document, in another document or in a re-upload) is flagged with that
+    chunk's ``content_hash``.
+    """
+
+    def __init__(
+        self,
+        tokenizer: Optional[BaseTokenizer] = None,
+        sentence_splitter: Optional[BaseSentenceSplitter] = None,
+        section_workers: int = CHUNKER_SECTION_WORKERS,
+        executor: str = CHUNKER_SECTION_EXECUTOR,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+        formatter: Optional[ContentFormatter] = None,
+    ):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f'Unsupported executor type: {executor}')
+        self.tokenizer = tokenizer or create_tokenizer()
+        self.sentence_splitter = sentence_splitter or create_sentence_splitter()
+        self.section_workers = section_workers
+        self.executor = executor
+        self.near_duplicates = near_duplicates
+        self.formatter = formatter or ContentFormatter()
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # Section workers chunk serially
+        state['_pool'] = None
+        state['section_workers'] = 0
+        # Duplicates are resolved in the parent, in document order
+        state['near_duplicates'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Optional[Executor]:
+        if self.section_workers <= 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                pool_class = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+                self._pool = pool_class(max_workers=self.section_workers)
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
 
     def chunk_markdown_by_title_and_tokens(self, text: str, filename: str, min_heading_level: int = 1) -> List[
         Chunk
     ]:
-        pattern = r'(#{1,6})\s+(.+)'
-        matches = list(re.finditer(pattern, text))
-        all_chunks = []
+        return list(self.iter_chunks(text, filename, min_heading_level))
 
-        for idx, match in enumerate(matches):
-            heading_marks = match.group(1)
-            section_title = match.group(2).strip()
-            heading_level = len(heading_marks)
+    def iter_chunks(self, text: str, filename: str, min_heading_level: int = 1) -> Iterator[Chunk]:
+        """Yield chunks in document order as each section is chunked."""
+        for section_chunks in self.iter_section_chunks(text, filename, min_heading_level):
+            yield from section_chunks
 
-            if heading_level < min_heading_level:
+    def iter_section_chunks(self, text: str, filename: str, min_heading_level: int = 1) -> Iterator[
+        List[Chunk]
+    ]:
+        """Yield the chunks of one heading section at a time, numbered across the document."""
+        sections = []
+        for section in parse_sections(text).sections:
+            if section.level < min_heading_level:
                 continue
 
-            start = match.end()
-            end = matches[idx + 1].start() if idx + 1 < len(matches) else len(text)
-            section_content = text[start:end].strip()
+            raw_section = section.content(text)
+            section_content = raw_section.strip()
 
             if not section_content:
                 continue
 
-            section_chunks = self.smart_chunk_section(section_content, filename, section_title)
-            for chunk in section_chunks:
-                chunk.heading_level = heading_level
-
-            all_chunks.extend(section_chunks)
+            offset = section.content_start + len(raw_section) - len(raw_section.lstrip())
+            sections.append((section_content, section.title, section.level, offset, section.path))
+
+        pool = self._get_pool() if len(sections) > 1 else None
+        if pool is not None:
+            results = pool.map(
+                _chunk_section,
+                repeat(self),
+                (section[0] for section in sections),
+                repeat(filename),
+                (section[1] for section in sections),
+                (section[2] for section in sections),
+                (section[3] for section in sections),
+            )
+        else:
+            results = (
+                _chunk_section(self, content, filename, title, level, offset)
+                for content, title, level, offset, _ in sections
+            )
 
-        return all_chunks
+        # Section-local ids become the document-scoped sequence, in document order
+        next_id = 0
+        seen_hashes: Set[str] = set()
+        for (*_, section_path), section_chunks in zip(sections, results):
+            kept = []
+            for chunk in section_chunks:
+                chunk.attach_source(text)
+                if not self._resolve_near_duplicate(chunk, filename, seen_hashes):
+                    continue
+                chunk.id = next_id
+                chunk.section_path = section_path
+                next_id += 1
+                kept.append(chunk)
+            if kept:
+                yield kept
+
+    def _resolve_near_duplicate(self, chunk: Chunk, filename: str, seen_hashes: Set[str]) -> bool:
+        """Set the chunk hashes, False when it repeats a chunk of the document word for word.
+
+        Near-duplicates, in this document or an earlier one, are kept and only flagged:
+        clauses differing in a number or a date must stay retrievable.
+        """
+        chunk_text = chunk.text
+        chunk.content_hash = text_hash(chunk_text)
+        if self.near_duplicates is None:
+            return True
+        if chunk.content_hash in seen_hashes:
+            return False
+        seen_hashes.add(chunk.content_hash)
+
+        signature = minhash(chunk_text)
+        if signature is None:
+            return True
+
+        # Chunks are added as they are kept, so this also finds earlier chunks of this document
+        match = self.near_duplicates.find(signature)
+        if match is not None:
+            chunk.near_duplicate_of = match.content_hash
+        self.near_duplicates.add(signature, chunk.content_hash, filename)
+        return True
 
     def smart_chunk_section(
         self, text: str, filename: str, section_title: str, max_tokens: int = 2048,
-        sentence_overlap: int = 2,
+        sentence_overlap: int = 2, offset: int = 0,
     ) -> List[Chunk]:
-        if self.is_markdown_table(text):
-            return self.handle_table_chunking(text, filename, section_title, max_tokens)
-
-        sentences = nltk.sent_tokenize(text)
+        """Chunk one section; chunk offsets are relative to the document, ``text`` starts at ``offset``."""
+        table = MarkdownTable(text)
+        if table.is_table:
+            return self.handle_table_chunking(text, filename, section_title, max_tokens, offset, table)
+
+        spans = self.sentence_splitter.span_tokenize(text)
+        sentences = [text[start:end] for start, end in spans]
+        # Count every sentence once; windows are then sized from prefix sums
+        token_prefix = list(accumulate(self.tokenizer.count_batch(sentences), initial=0))
         chunks = []
         seen_hashes = set()
         i = 0
         last_chunk_sentences: List[str] = []
 
         while i < len(sentences):
-            token_count = 0
-            selected_sentences = []
-            j = i
-
-            while j < len(sentences):
-                sentence = sentences[j]
-                tokens = self.count_tokens(sentence)
-                if token_count + tokens > max_tokens:
-                    break
-                selected_sentences.append(sentence)
-                token_count += tokens
-                j += 1
+            # Longest run of sentences from i that fits in max_tokens
+            j = bisect_right(token_prefix, token_prefix[i] + max_tokens, lo=i) - 1
+            selected_sentences = sentences[i:j]
+            token_count = token_prefix[j] - token_prefix[i]
+            first = i
 
             if not selected_sentences:
                 i += 1
@@ -111,8 +276,9 @@ class Chunker:
                         break
 
                 if sentences_to_remove > 0:
+                    first += sentences_to_remove
                     selected_sentences = selected_sentences[sentences_to_remove:]
-                    token_count = self.count_tokens(' '.join(selected_sentences))
+                    token_count = token_prefix[j] - token_prefix[first]
 
                     if not selected_sentences:
                         i += 1
@@ -121,7 +287,8 @@ class Chunker:
             content = ' '.join(selected_sentences).strip()
             content = self.enhance_content_formatting(content)
 
-            if self.is_invalid_table_fragment(content):
+            content_table = MarkdownTable(content)
+            if content_table.is_invalid_fragment:
                 i = j
                 continue
 
@@ -132,200 +299,89 @@ class Chunker:
 
             seen_hashes.add(content_hash)
 
-            chunk_type = 'table' if self.is_markdown_table(content) else 'text'
-            content_table_json = self.parse_markdown_table(content) if chunk_type == 'table' else None
+            chunk_type = 'table' if content_table.is_table else 'text'
+            content_table_json = content_table.records() if chunk_type == 'table' else None
 
+            start, end = spans[first][0], spans[j - 1][1]
             chunk = Chunk(
-                id=self.chunk_id,
-                content=content,
+                id=len(chunks),
+                # Only keep a copy when the chunk is not a verbatim slice of the section
+                content=None if content == text[start:end] else content,
                 filename=filename,
                 section_title=section_title,
                 position=i,
                 tokens=token_count,
                 type=chunk_type,
                 content_json=content_table_json,
+                start=offset + start,
+                end=offset + end,
             )
             chunks.append(chunk)
-            self.chunk_id += 1
 
             last_chunk_sentences = selected_sentences[-sentence_overlap:] if len(selected_sentences) >= sentence_overlap else selected_sentences
             i = max(i + len(selected_sentences) - sentence_overlap, i + 1) if j < len(sentences) else j
 
         return chunks
 
-    def handle_table_chunking(self, table_text: str, filename: str, section_title: str, max_tokens: int = 2048) -> List[
-        Chunk
-    ]:
-        if self.count_tokens(table_text) <= max_tokens:
+    def handle_table_chunking(
+        self, table_text: str, filename: str, section_title: str, max_tokens: int = 2048, offset: int = 0,
+        table: Optional[MarkdownTable] = None,
+    ) -> List[Chunk]:
+        table = table or MarkdownTable(table_text)
+        table_tokens = self.count_tokens(table_text)
+        if table_tokens <= max_tokens:
             chunk = Chunk(
-                id=self.chunk_id,
-                content=table_text,
+                id=0,
                 filename=filename,
                 section_title=section_title,
                 position=0,
-                tokens=self.count_tokens(table_text),
+                tokens=table_tokens,
                 type='table',
-                content_json=self.parse_markdown_table(table_text),
+                content_json=table.records(),
+                start=offset,
+                end=offset + len(table_text),
             )
-            self.chunk_id += 1
             return [chunk]
 
-        table_chunks = self.split_large_markdown_table(table_text, max_tokens)
         chunks = []
-
-        for i, chunk_content in enumerate(table_chunks):
+        for i, piece in enumerate(table.split(self.tokenizer, max_tokens)):
             chunk = Chunk(
-                id=self.chunk_id,
-                content=chunk_content,
+                id=i,
+                # Pieces after the first repeat the header, so only the first can be a plain slice
+                content=None if piece.text == table_text[piece.start:piece.end] else piece.text,
                 filename=filename,
                 section_title=section_title,
                 position=i,
-                tokens=self.count_tokens(chunk_content),
+                tokens=piece.tokens,
                 type='table',
-                content_json=self.parse_markdown_table(chunk_content),
+                content_json=table.records(piece.start_row, piece.end_row) if piece.start_row is not None else [],
+                start=offset + piece.start,
+                end=offset + piece.end,
             )
             chunks.append(chunk)
-            self.chunk_id += 1
 
         return chunks
 
     def enhance_content_formatting(self, content: str) -> str:
-        lines = content.strip().split('\n')
-        bullet_count = sum(1 for line in lines if line.strip().startswith('- ') or line.strip().startswith('• '))
-
-        if bullet_count >= 3:
-            if any(
-                keyword in content.lower() for keyword in
-                ['địa chỉ', 'số nhà', 'phường', 'quận', 'tỉnh', 'thành phố']
-            ):
-                return self.format_address_info(content)
-            else:
-                return self.format_bullet_points_to_table(content)
-
-        return content
+        return self.formatter.format(content)
 
     def format_address_info(self, text: str) -> str:
-        lines = text.strip().split('\n')
-        address_items = []
-        other_items = []
-        address_fields = ['Số nhà/Đường', 'Phường/Xã', 'Quận/Huyện', 'Tỉnh/Thành phố', 'Mã bưu chính']
-
-        for line in lines:
-            line = line.strip()
-            if line.startswith('- ') or line.startswith('• '):
-                content = line[2:].strip()
-                if ':' in content:
-                    key, value = content.split(':', 1)
-                    key = key.strip()
-                    value = value.strip()
-
-                    if any(field in key for field in address_fields):
-                        address_items.append({'key': key, 'value': value})
-                    else:
-                        other_items.append({'key': key, 'value': value})
-
-        result = []
-        if address_items:
-            result.append('**Địa chỉ:**')
-            result.append('| Thông tin | Chi tiết |')
-            result.append('| --- | --- |')
-            for item in address_items:
-                result.append(f"| {item['key']} | {item['value']} |")
-            result.append('')
-
-        if other_items:
-            result.append('**Thông tin bổ sung:**')
-            result.append('| Thông tin | Chi tiết |')
-            result.append('| --- | --- |')
-            for item in other_items:
-                result.append(f"| {item['key']} | {item['value']} |")
-
-        return '\n'.join(result)
+        return self.formatter.rule('address').apply(self.formatter.classify(text))
 
     def format_bullet_points_to_table(self, text: str) -> str:
-        lines = text.strip().split('\n')
-        bullet_items = []
-
-        for line in lines:
-            line = line.strip()
-            if line.startswith('- ') or line.startswith('• '):
-                content = line[2:].strip()
-                if ':' in content:
-                    key, value = content.split(':', 1)
-                    bullet_items.append({'key': key.strip(), 'value': value.strip()})
-                else:
-                    bullet_items.append({'key': content, 'value': ''})
-
-        if len(bullet_items) >= 3:
-            table_lines = ['| Thông tin | Chi tiết |', '| --- | --- |']
-            for item in bullet_items:
-                key = item['key']
-                value = item['value']
-                table_lines.append(f'| {key} | {value} |')
-            return '\n'.join(table_lines)
-
-        return text
+        return self.formatter.rule('bullets').apply(self.formatter.classify(text))
 
     def is_markdown_table(self, text: str) -> bool:
-        lines = [line.strip() for line in re.split(r'\r?\n', text.strip()) if line.strip()]
-        if len(lines) >= 2:
-            if '|' in lines[0] and '|' in lines[1]:
-                return re.fullmatch(r'\|?[-|:\s]+[-|:\s]+\|?', lines[1]) is not None
-        return False
+        return MarkdownTable(text).is_table
 
     def is_invalid_table_fragment(self, text: str) -> bool:
-        lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
-        if len(lines) < 3 and any('|' in line for line in lines):
-            has_separator = any(re.fullmatch(r'\|?[-|:\s]+[-|:\s]+\|?', line) for line in lines)
-            if not has_separator:
-                table_like_lines = [line for line in lines if '|' in line and not line.startswith('#')]
-                if table_like_lines and len(table_like_lines) == len(lines):
-                    return True
-        return False
+        return MarkdownTable(text).is_invalid_fragment
 
     def parse_markdown_table(self, markdown: str) -> List[Dict[str, str]]:
-        lines = markdown.strip().splitlines()
-        table_lines = [line for line in lines if '|' in line]
-        if len(table_lines) < 3:
-            return []
-        headers = [h.strip() for h in table_lines[0].split('|') if h.strip()]
-        result = []
-        for row_line in table_lines[2:]:
-            values = [v.strip() for v in row_line.split('|') if v.strip()]
-            if len(values) == len(headers):
-                result.append(dict(zip(headers, values)))
-        return result
+        return MarkdownTable(markdown).records()
 
     def split_large_markdown_table(self, table_text: str, max_tokens: int = 2048) -> List[str]:
-        lines = [line.strip() for line in table_text.strip().splitlines() if line.strip()]
-        table_lines = [line for line in lines if '|' in line]
-        if len(table_lines) < 3:
-            return [table_text]
-
-        header = table_lines[0]
-        separator = table_lines[1]
-        rows = table_lines[2:]
-
-        header_tokens = self.count_tokens(header + '\n' + separator)
-        chunks = []
-        current_rows = [header, separator]
-        token_count = header_tokens
-
-        for row in rows:
-            row_tokens = self.count_tokens(row)
-            if token_count + row_tokens > max_tokens and len(current_rows) > 2:
-                chunks.append('\n'.join(current_rows))
-                current_rows = [header, separator, row]
-                token_count = header_tokens + row_tokens
-            else:
-                current_rows.append(row)
-                token_count += row_tokens
-
-        if len(current_rows) > 2:
-            chunks.append('\n'.join(current_rows))
-
-        return chunks
+        return [piece.text for piece in MarkdownTable(table_text).split(self.tokenizer, max_tokens)]
 
     def count_tokens(self, text: str) -> int:
-        words = text.split()
-        return math.ceil(len(words) * 1.3)
+        return self.tokenizer.count(text)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .tokenizer import BaseTokenizer
+
+SEPARATOR_PATTERN = re.compile(r'\|?[-|:\s]+[-|:\s]+\|?')
+
+
+def split_cells(line: str) -> List[str]:
+    return [cell.strip() for cell in line.split('|') if cell.strip()]
+
+
+@dataclass
+class TableSlice:
+    """A piece of a split table: rows ``[start_row, end_row)`` and their span in the table text."""
+    text: str
+    tokens: int
+    start: int
+    end: int
+    start_row: Optional[int] = None
+    end_row: Optional[int] = None
+
+
+class MarkdownTable:
+    """A Markdown table parsed once into header, separator and row arrays.
+
+    Lines are stripped and blank lines dropped; lines with a ``|`` are the table
+    lines, the first two being header and separator. Cell values, records and
+    per-row token counts are computed on first use and reused by every split.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines: List[str] = []
+        self.table_lines: List[str] = []
+        self._table_spans: List[Tuple[int, int]] = []
+
+        offset = 0
+        for raw_line in text.splitlines(keepends=True):
+            line = raw_line.strip()
+            if line:
+                self.lines.append(line)
+                if '|' in line:
+                    start = offset + len(raw_line) - len(raw_line.lstrip())
+                    self.table_lines.append(line)
+                    self._table_spans.append((start, start + len(line)))
+            offset += len(raw_line)
+
+    @property
+    def is_table(self) -> bool:
+        """Whether the text starts with a header row followed by a separator row."""
+        return (
+            len(self.lines) >= 2 and '|' in self.lines[0] and '|' in self.lines[1]
+            and SEPARATOR_PATTERN.fullmatch(self.lines[1]) is not None
+        )
+
+    @property
+    def is_invalid_fragment(self) -> bool:
+        """A couple of table rows cut off from their header and separator."""
+        if len(self.lines) < 3 and self.table_lines:
+            if not any(SEPARATOR_PATTERN.fullmatch(line) for line in self.lines):
+                table_like_lines = [line for line in self.table_lines if not line.startswith('#')]
+                return bool(table_like_lines) and len(table_like_lines) == len(self.lines)
+        return False
+
+    @property
+    def header(self) -> str:
+        return self.table_lines[0]
+
+    @property
+    def separator(self) -> str:
+        return self.table_lines[1]
+
+    @cached_property
+    def rows(self) -> List[str]:
+        return self.table_lines[2:]
+
+    @cached_property
+    def header_cells(self) -> List[str]:
+        return split_cells(self.header)
+
+    @cached_property
+    def row_cells(self) -> List[List[str]]:
+        return [split_cells(row) for row in self.rows]
+
+    def records(self, start_row: int = 0, end_row: Optional[int] = None) -> List[Dict[str, str]]:
+        """Rows as header -> value dicts, skipping rows whose cell count differs from the header."""
+        if len(self.table_lines) < 3:
+            return []
+        headers = self.header_cells
+        return [
+            dict(zip(headers, values))
+            for values in self.row_cells[start_row:end_row]
+            if len(values) == len(headers)
+        ]
+
+    def split(self, tokenizer: BaseTokenizer, max_tokens: int) -> List[TableSlice]:
+        """Pack rows greedily into pieces of at most max_tokens, each repeating the header."""
+        if len(self.table_lines) < 3:
+            return [TableSlice(self.text, tokenizer.count(self.text), 0, len(self.text))]
+
+        header_tokens = tokenizer.count(self.header + '\n' + self.separator)
+        row_tokens = tokenizer.count_batch(self.rows)
+
+        slices = []
+        start_row = 0
+        token_count = header_tokens
+        for row_idx, tokens in enumerate(row_tokens):
+            if token_count + tokens > max_tokens and row_idx > start_row:
+                slices.append(self._slice(start_row, row_idx, token_count))
+                start_row = row_idx
+                token_count = header_tokens
+            token_count += tokens
+
+        if start_row < len(row_tokens):
+            slices.append(self._slice(start_row, len(row_tokens), token_count))
+        return slices
+
+    def _slice(self, start_row: int, end_row: int, tokens: int) -> TableSlice:
+        text = '\n'.join([self.header, self.separator, *self.rows[start_row:end_row]])
+        # The first piece starts at the header, later ones only span their own rows
+        start = self._table_spans[0 if start_row == 0 else start_row + 2][0]
+        end = self._table_spans[end_row + 1][1]
+        return TableSlice(text, tokens, start, end, start_row, end_row)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
+from typing import List
+from typing import Optional
+
+from .config import CHUNKER_TOKENIZER_PATH
+from .config import TOKEN_CACHE_SIZE
+
+
+class BaseTokenizer(ABC):
+    """Counts tokens the way the embedding model will see them."""
+
+    @abstractmethod
+    def count_batch(self, texts: List[str]) -> List[int]:
+        """Token count of every text, in order."""
+        raise NotImplementedError()
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+
+class HeuristicTokenizer(BaseTokenizer):
+    """Word count times 1.3, for when no tokenizer model is configured."""
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        return [math.ceil(len(text.split()) * 1.3) for text in texts]
+
+
+class HuggingFaceTokenizer(BaseTokenizer):
+    """Tokenizer loaded from a local HuggingFace ``tokenizer.json`` file."""
+
+    def __init__(self, path: str):
+        # Optional dependency, only needed when a tokenizer file is configured
+        from tokenizers import Tokenizer
+
+        self.path = path
+        self._tokenizer = Tokenizer.from_file(path)
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        encodings = self._tokenizer.encode_batch(texts, add_special_tokens=False)
+        return [len(encoding.ids) for encoding in encodings]
+
+
+class CachedTokenizer(BaseTokenizer):
+    """Bounded LRU of token counts keyed by content hash, in front of another tokenizer.
+
+    Only the texts missing from the cache are sent to the wrapped tokenizer, in a
+    single batch call.
+    """
+
+    def __init__(self, tokenizer: BaseTokenizer, max_size: int = TOKEN_CACHE_SIZE):
+        self.tokenizer = tokenizer
+        self.max_size = max_size
+        self._counts: OrderedDict[bytes, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_counts'] = OrderedDict()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        keys = [hashlib.blake2b(text.encode(), digest_size=16).digest() for text in texts]
+        counts: List[Optional[int]] = [None] * len(texts)
+        missing = []
+
+        with self._lock:
+            for idx, key in enumerate(keys):
+                count = self._counts.get(key)
+                if count is None:
+                    missing.append(idx)
+                else:
+                    self._counts.move_to_end(key)
+                    counts[idx] = count
+
+        if missing:
+            computed = self.tokenizer.count_batch([texts[idx] for idx in missing])
+            with self._lock:
+                for idx, count in zip(missing, computed):
+                    counts[idx] = count
+                    self._counts[keys[idx]] = count
+                while len(self._counts) > self.max_size:
+                    self._counts.popitem(last=False)
+
+        return counts  # type: ignore[return-value]
+
+
+def create_tokenizer(
+    path: Optional[str] = CHUNKER_TOKENIZER_PATH,
+    cache_size: int = TOKEN_CACHE_SIZE,
+) -> BaseTokenizer:
+    if not path:
+        # Cheaper to recount than to hash
+        return HeuristicTokenizer()
+
+    tokenizer: BaseTokenizer = HuggingFaceTokenizer(path)
+    if cache_size > 0:
+        tokenizer = CachedTokenizer(tokenizer, cache_size)
+    return tokenizer
@@ -4,6 +4,7 @@ from .base import BaseEmbedderService
 from .base import ChunkData
 from .base import EmbedderInput
 from .base import EmbedderOutput
+from .cache import EmbeddingCache
 from .service import BedrockEmbeddingGenerator
 from .service import EmbedderService
 from .service import OpenSearchStorage
@@ -13,6 +14,7 @@ __all__ = [
     'EmbedderOutput',
     'BaseEmbedderService',
     'ChunkData',
+    'EmbeddingCache',
     'EmbedderService',
     'OpenSearchStorage',
     'BedrockEmbeddingGenerator',
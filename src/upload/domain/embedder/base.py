@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+import math
+import random
+import threading
+import time
 from abc import ABC
 from abc import abstractmethod
+from typing import Any
 from typing import Dict
 from typing import List
 from typing import Optional
 
 from pydantic import BaseModel
+from shared.model import SourceTextModel
+
+from .config import EMBEDDING_DOCUMENT_DEADLINE_S
+from .config import EMBEDDING_RETRY_BASE_DELAY_S
+from .config import EMBEDDING_RETRY_MAX_DELAY_S
+from .config import logger
 
 
 class EmbedderInput(BaseModel):
@@ -21,10 +33,10 @@ class EmbedderOutput(BaseModel):
     num_embeddings: Optional[int] = 0
 
 
-class ChunkData(BaseModel):
-    """Data model for chunk processing."""
+class ChunkData(SourceTextModel):
+    """Data model for chunk processing, text is read through ``text``."""
     id: int
-    content: str
+    content: Optional[str] = None
     section_title: str
     filename: str
     position: Optional[int] = 0
@@ -32,6 +44,11 @@ class ChunkData(BaseModel):
     type: Optional[str] = None
     content_json: Optional[List[Dict[str, str]]] = None
     heading_level: Optional[int] = None
+    start: Optional[int] = None
+    end: Optional[int] = None
+    section_path: Optional[List[str]] = None
+    content_hash: Optional[str] = None
+    near_duplicate_of: Optional[str] = None
 
 
 class BaseEmbedderService(ABC):
@@ -43,14 +60,129 @@ class BaseEmbedderService(ABC):
         raise NotImplementedError()
 
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count used to size requests, same heuristic as the chunker's default."""
+    return math.ceil(len(text.split()) * 1.3)
+
+
+def pack_batches(texts: List[str], max_items: int, max_tokens: int = 0) -> List[List[int]]:
+    """Group text indices, in order, into requests of at most max_items texts and max_tokens
+    estimated tokens (0 for no token budget). A text over the budget is sent on its own."""
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    batch_tokens = 0
+    for idx, text in enumerate(texts):
+        tokens = estimate_tokens(text) if max_tokens else 0
+        if batch and (len(batch) >= max_items or (max_tokens and batch_tokens + tokens > max_tokens)):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(idx)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingError(Exception):
+    """Texts could not be embedded before retries or the deadline ran out."""
+
+    def __init__(self, message: str, failed: List[int]):
+        super().__init__(message)
+        self.failed = failed
+
+
 class BaseEmbeddingGenerator(ABC):
-    """Abstract base class for embedding generators."""
+    """Abstract base class for embedding generators.
+
+    Subclasses implement :meth:`embed_request`, one model call for up to
+    ``max_batch_size`` texts. :meth:`get_embedding_batch` packs texts into such
+    requests and keeps up to ``max_concurrency`` of them in flight, so single-input
+    models (``max_batch_size = 1``) get a pipelined stream of requests and
+    multi-input models get token-aware packed ones.
+
+    Requests failing with an error :meth:`is_retryable` accepts are retried with
+    full-jitter exponential backoff until the deadline; texts are never dropped,
+    if any request still fails :class:`EmbeddingError` is raised.
+    """
+
+    max_batch_size: int = 1
+    max_batch_tokens: int = 0
+    max_concurrency: int = 1
+    retry_base_delay: float = EMBEDDING_RETRY_BASE_DELAY_S
+    retry_max_delay: float = EMBEDDING_RETRY_MAX_DELAY_S
+
+    def __init__(self):
+        self._counters = {'requests': 0, 'retries': 0, 'failures': 0}
+        self._counters_lock = threading.Lock()
 
     @abstractmethod
-    async def get_embedding_batch(self, texts: List[str]) -> Dict[int, List[float]]:
-        """Generate embeddings for multiple texts."""
+    async def embed_request(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in a single model request, one vector per text in order."""
         raise NotImplementedError()
 
+    def is_retryable(self, error: Exception) -> bool:
+        """Whether a failed request may succeed when sent again."""
+        return False
+
+    def _count(self, counter: str) -> None:
+        # Generators are shared by uploads running on different threads
+        with self._counters_lock:
+            self._counters[counter] += 1
+
+    async def _request_with_retry(self, texts: List[str], deadline: float) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self._count('requests')
+            try:
+                return await self.embed_request(texts)
+            except Exception as e:
+                delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+                if not self.is_retryable(e) or time.monotonic() + delay > deadline:
+                    raise
+                attempt += 1
+                self._count('retries')
+                logger.warning(f'Thử lại lần {attempt} sau {delay:.2f}s cho {len(texts)} text: {e}')
+                await asyncio.sleep(delay)
+
+    async def get_embedding_batch(self, texts: List[str], deadline: Optional[float] = None) -> Dict[int, List[float]]:
+        """Generate embeddings for multiple texts, keyed by index.
+
+        ``deadline`` is a ``time.monotonic()`` timestamp after which failed requests
+        are no longer retried, ``EMBEDDING_DOCUMENT_DEADLINE_S`` from now by default.
+        Raises :class:`EmbeddingError` naming the texts that could not be embedded.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + EMBEDDING_DOCUMENT_DEADLINE_S
+        embeddings: Dict[int, List[float]] = {}
+        failed: List[int] = []
+        batches = pack_batches(texts, self.max_batch_size, self.max_batch_tokens)
+        pending = iter(batches)
+
+        async def worker() -> None:
+            # Workers pull the next request as soon as theirs completes
+            for batch in pending:
+                try:
+                    vectors = await self._request_with_retry([texts[idx] for idx in batch], deadline)
+                except Exception as e:
+                    self._count('failures')
+                    logger.error(f'Lỗi tạo embedding cho {len(batch)} text (từ text {batch[0]}): {e}')
+                    failed.extend(batch)
+                    continue
+                embeddings.update(zip(batch, vectors))
+
+        await asyncio.gather(*(worker() for _ in range(min(self.max_concurrency, len(batches)))))
+        if failed:
+            raise EmbeddingError(f'Không tạo được embedding cho {len(failed)}/{len(texts)} text', sorted(failed))
+        return embeddings
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            return dict(self._counters)
+
+    def shutdown(self) -> None:
+        """Release resources held by the generator."""
+
 
 class BaseStorage(ABC):
     """Abstract base class for storage backends."""
@@ -66,6 +198,31 @@ class BaseStorage(ABC):
         raise NotImplementedError()
 
     @abstractmethod
-    def bulk_index_chunks(self, chunks: List[ChunkData], embeddings: Dict[int, List[float]]) -> None:
-        """Bulk index chunks with embeddings."""
+    def bulk_index_chunks(
+        self,
+        chunks: List[ChunkData],
+        embeddings: Dict[int, List[float]],
+        refresh: bool = True,
+        upload_id: Optional[str] = None,
+    ) -> None:
+        """Bulk index chunks with embeddings, under :meth:`document_id` ids."""
         raise NotImplementedError()
+
+    @staticmethod
+    def document_id(chunk: ChunkData, upload_id: str) -> str:
+        """Storage id of a chunk, unique without coordinating with other workers.
+
+        Chunk ids are scoped to their document and every upload has its own
+        ``upload_id``, so uploads never overwrite each other, even of the same file.
+        """
+        return f'{upload_id}:{chunk.id}'
+
+    def refresh(self) -> None:
+        """Make indexed chunks visible to search."""
+
+    def delete_chunks(self, ids: List[str]) -> None:
+        """Remove indexed chunks by storage id."""
+
+    def get_embeddings_by_content_hash(self, content_hashes: List[str]) -> Dict[str, List[float]]:
+        """Stored vectors of already indexed chunks, keyed by content hash."""
+        return {}
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import numpy as np
+
+from .config import EMBEDDING_CACHE_DTYPE
+from .config import EMBEDDING_CACHE_MAX_MB
+from .config import EMBEDDING_CACHE_PATH
+from .config import logger
+
+CACHE_DTYPES = ('float16', 'float32')
+# Evict down to this fraction of the cap, so eviction does not run on every write
+EVICTION_TARGET = 0.9
+PAGE_SIZE = 16384
+
+
+class EmbeddingCache:
+    """Bounded on-disk embedding cache in a SQLite (WAL) file shared by all workers.
+
+    Keys are the SHA-256 of model id, dimension and text, so the same text embedded
+    by another model or at another size never collides. Vectors are stored as raw
+    float16 or float32 arrays; the stored width is recovered from the blob length,
+    so changing ``dtype`` keeps older entries readable. Once the used database size
+    exceeds ``max_mb`` the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        dimension: int,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_mb: int = EMBEDDING_CACHE_MAX_MB,
+        dtype: str = EMBEDDING_CACHE_DTYPE,
+    ):
+        if dtype not in CACHE_DTYPES:
+            raise ValueError(f'Unsupported embedding cache dtype: {dtype}')
+        self.model_id = model_id
+        self.dimension = dimension
+        self.path = path
+        self.max_bytes = max_mb * 1024 * 1024
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Other workers may hold the write lock briefly
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            # Only applies when the file is created: a 1024-d float16 vector is just over
+            # 2 KB, so default 4 KB pages would hold one row each
+            self._conn.execute(f'PRAGMA page_size={PAGE_SIZE}')
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                'key BLOB PRIMARY KEY, vector BLOB NOT NULL, accessed REAL NOT NULL) WITHOUT ROWID',
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)')
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f'{self.model_id}|{self.dimension}|{text}'.encode()).digest()
+
+    def _decode(self, blob: bytes) -> Optional[List[float]]:
+        if len(blob) == self.dimension * 2:
+            dtype = np.float16
+        elif len(blob) == self.dimension * 4:
+            dtype = np.float32
+        else:
+            # Not a vector of this dimension, treat as a miss
+            return None
+        return np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+
+    def get_many(self, texts: List[str]) -> Dict[int, List[float]]:
+        """Cached vectors keyed by index into texts."""
+        if not texts:
+            return {}
+        keys = [self.key(text) for text in texts]
+        found: Dict[bytes, bytes] = {}
+        try:
+            with self._lock:
+                # Stay well under SQLite's bound parameter limit
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    placeholders = ','.join('?' * len(batch))
+                    found.update(
+                        self._conn.execute(
+                            f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', batch,
+                        ),
+                    )
+                if found:
+                    now = time.time()
+                    with self._conn:
+                        self._conn.executemany(
+                            'UPDATE embeddings SET accessed = ? WHERE key = ?', [(now, key) for key in found],
+                        )
+        except sqlite3.Error as e:
+            logger.warning(f'Lỗi đọc embedding cache {self.path}: {e}')
+            return {}
+
+        embeddings = {}
+        for idx, key in enumerate(keys):
+            vector = self._decode(found[key]) if key in found else None
+            if vector is not None:
+                embeddings[idx] = vector
+        return embeddings
+
+    def put_many(self, embeddings: Dict[str, List[float]]) -> None:
+        """Store vectors keyed by text, then evict if the cache is over its size cap."""
+        if not embeddings:
+            return
+        now = time.time()
+        rows = [
+            (self.key(text), np.asarray(vector, dtype=self.dtype).tobytes(), now)
+            for text, vector in embeddings.items()
+        ]
+        try:
+            with self._lock:
+                with self._conn:
+                    self._conn.executemany('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)', rows)
+                self._evict()
+        except sqlite3.Error as e:
+            logger.warning(f'Lỗi ghi embedding cache {self.path}: {e}')
+
+    def _evict(self) -> None:
+        page_size = self._conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = self._conn.execute('PRAGMA page_count').fetchone()[0]
+        free_pages = self._conn.execute('PRAGMA freelist_count').fetchone()[0]
+        used_bytes = (page_count - free_pages) * page_size
+        if used_bytes <= self.max_bytes:
+            return
+
+        count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        if not count:
+            return
+        # Freed pages are reused by later writes, the file itself does not shrink
+        excess = used_bytes - self.max_bytes * EVICTION_TARGET
+        evict_count = max(1, int(count * excess / used_bytes))
+        with self._conn:
+            self._conn.execute(
+                'DELETE FROM embeddings WHERE key IN '
+                '(SELECT key FROM embeddings ORDER BY accessed LIMIT ?)',
+                (evict_count,),
+            )
+        logger.info(f'Đã xoá {evict_count} embedding cũ khỏi cache')
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from botocore.exceptions import ConnectionError
+from botocore.exceptions import HTTPClientError
+
+from .config import BEDROCK_MAX_CONNECTIONS
+from .config import EMBEDDING_INITIAL_CONCURRENCY
+from .config import EMBEDDING_MAX_CONCURRENCY
+from .config import EMBEDDING_MIN_CONCURRENCY
+from .config import REGION_NAME
+from .limiter import AdaptiveConcurrencyLimiter
+
+THROTTLING_ERROR_CODES = frozenset({
+    'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException',
+})
+RETRYABLE_ERROR_CODES = THROTTLING_ERROR_CODES | {
+    'ServiceUnavailableException', 'InternalServerException', 'ModelNotReadyException', 'ModelTimeoutException',
+}
+
+
+def _error_code(error: Exception) -> str:
+    return error.response.get('Error', {}).get('Code', '') if isinstance(error, ClientError) else ''
+
+
+def is_throttling_error(error: Exception) -> bool:
+    return _error_code(error) in THROTTLING_ERROR_CODES
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Throttling, transient service errors and dropped or timed out connections."""
+    return _error_code(error) in RETRYABLE_ERROR_CODES or isinstance(error, (ConnectionError, HTTPClientError))
+
+
+class BedrockRuntimeClient:
+    """Process-wide bedrock-runtime client, awaitable from any event loop.
+
+    boto3 is blocking, so calls run on a thread pool with one thread per pooled
+    keep-alive connection. That pool is shared by every upload worker thread and
+    its event loop, so it caps the calls in flight: extra calls queue instead of
+    opening connections beyond the pool. Within that cap an
+    :class:`AdaptiveConcurrencyLimiter` sets how many calls actually run, backing
+    off on throttling. Nothing here is bound to an event loop; callers await a
+    future from :func:`asyncio.wrap_future`.
+
+    botocore retries are disabled so every throttle reaches the limiter; callers
+    retry with :func:`is_retryable_error`.
+    """
+
+    _instances: Dict[Tuple[int, str], BedrockRuntimeClient] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, region_name: str = REGION_NAME, max_connections: int = BEDROCK_MAX_CONNECTIONS):
+        self.region_name = region_name
+        self.max_connections = max_connections
+        config = Config(
+            max_pool_connections=max_connections,
+            tcp_keepalive=True,
+            retries={'mode': 'standard', 'total_max_attempts': 1},
+        )
+        self._client = boto3.client('bedrock-runtime', region_name=region_name, config=config)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='bedrock')
+        max_limit = min(EMBEDDING_MAX_CONCURRENCY, max_connections)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial=min(EMBEDDING_INITIAL_CONCURRENCY, max_limit),
+            min_limit=min(EMBEDDING_MIN_CONCURRENCY, max_limit),
+            max_limit=max_limit,
+        )
+
+    @classmethod
+    def shared(cls, region_name: str = REGION_NAME) -> BedrockRuntimeClient:
+        """The client for this process and region, created on first use."""
+        # Keyed by pid so forked workers never reuse the parent's threads
+        key = (os.getpid(), region_name)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(region_name)
+            return cls._instances[key]
+
+    async def invoke_model(self, **kwargs: Any) -> Dict[str, Any]:
+        """Invoke a model and return the decoded JSON response body."""
+        return await asyncio.wrap_future(self._executor.submit(self._invoke_model, kwargs))
+
+    def _invoke_model(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        with self.limiter:
+            start = time.monotonic()
+            try:
+                response = self._client.invoke_model(**kwargs)
+                # The body is a stream, read it on the pool thread too
+                result = json.loads(response['body'].read())
+            except Exception as e:
+                self.limiter.record(time.monotonic() - start, throttled=is_throttling_error(e), failed=True)
+                raise
+            self.limiter.record(time.monotonic() - start)
+            return result
+
+    def shutdown(self) -> None:
+        """Wait for calls in flight and stop the pool; :meth:`shared` creates a new client afterwards."""
+        with self._instances_lock:
+            for key, instance in list(self._instances.items()):
+                if instance is self:
+                    del self._instances[key]
+        self._executor.shutdown(wait=True)
@@ -13,8 +13,36 @@ logger = logging.getLogger(__name__)
 
 # Configuration
 REGION_NAME = os.getenv('REGION_NAME', 'ap-southeast-2')
-MAX_WORKERS = 16
+# Adaptive (AIMD) limit on embedding calls in flight per process
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv('EMBEDDING_MAX_CONCURRENCY', '32'))
+EMBEDDING_MIN_CONCURRENCY = int(os.getenv('EMBEDDING_MIN_CONCURRENCY', '2'))
+EMBEDDING_INITIAL_CONCURRENCY = int(os.getenv('EMBEDDING_INITIAL_CONCURRENCY', '8'))
+EMBEDDING_LATENCY_TARGET_MS = int(os.getenv('EMBEDDING_LATENCY_TARGET_MS', '2000'))  # slower calls stop the increase
+# Retries with jittered exponential backoff, until a document's embedding deadline
+EMBEDDING_RETRY_BASE_DELAY_S = float(os.getenv('EMBEDDING_RETRY_BASE_DELAY_S', '0.5'))
+EMBEDDING_RETRY_MAX_DELAY_S = float(os.getenv('EMBEDDING_RETRY_MAX_DELAY_S', '20'))
+EMBEDDING_DOCUMENT_DEADLINE_S = float(os.getenv('EMBEDDING_DOCUMENT_DEADLINE_S', '900'))
+# Keep-alive connections to bedrock-runtime, shared by every upload in the process
+BEDROCK_MAX_CONNECTIONS = int(os.getenv('BEDROCK_MAX_CONNECTIONS', str(EMBEDDING_MAX_CONCURRENCY)))
+# Titan (one text per request) or a multi-input model such as Cohere Embed
+BEDROCK_EMBEDDING_MODEL_ID = os.getenv('BEDROCK_EMBEDDING_MODEL_ID', 'amazon.titan-embed-text-v2:0')
+EMBEDDING_DIMENSION = int(os.getenv('EMBEDDING_DIMENSION', '1024'))
+# Packing of multi-input requests: texts per request and estimated tokens per request
+EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv('EMBEDDING_BATCH_MAX_ITEMS', '96'))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv('EMBEDDING_BATCH_MAX_TOKENS', '20000'))
 OPENSEARCH_ENDPOINT = os.getenv('OPENSEARCH_ENDPOINT')
 OPENSEARCH_USERNAME = os.getenv('OPENSEARCH_USERNAME', 'op')
 OPENSEARCH_PASSWORD = os.getenv('OPENSEARCH_PASSWORD')
 INDEX_NAME = os.getenv('INDEX_NAME', 'semantic_chunks')
+# Embed-and-index pipeline: chunks per embedding batch and batches embedded at once, then a
+# bounded queue of embedded chunks feeding a bulk indexer that flushes by size or time
+EMBEDDING_STREAM_BATCH_SIZE = int(os.getenv('EMBEDDING_STREAM_BATCH_SIZE', '64'))
+EMBEDDING_PIPELINE_DEPTH = int(os.getenv('EMBEDDING_PIPELINE_DEPTH', '4'))
+EMBEDDING_INDEX_QUEUE_SIZE = int(os.getenv('EMBEDDING_INDEX_QUEUE_SIZE', '256'))
+EMBEDDING_INDEX_FLUSH_SIZE = int(os.getenv('EMBEDDING_INDEX_FLUSH_SIZE', '100'))
+EMBEDDING_INDEX_FLUSH_INTERVAL_S = float(os.getenv('EMBEDDING_INDEX_FLUSH_INTERVAL_S', '2'))
+# Embedding cache shared by all workers: SQLite file, size cap, and 'float16' or 'float32' vectors
+EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', '.cache/embeddings.sqlite3')
+EMBEDDING_CACHE_MAX_MB = int(os.getenv('EMBEDDING_CACHE_MAX_MB', '1024'))
+EMBEDDING_CACHE_DTYPE = os.getenv('EMBEDDING_CACHE_DTYPE', 'float16').lower()
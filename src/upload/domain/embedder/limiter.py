@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+from typing import Dict
+
+from .config import EMBEDDING_INITIAL_CONCURRENCY
+from .config import EMBEDDING_LATENCY_TARGET_MS
+from .config import EMBEDDING_MAX_CONCURRENCY
+from .config import EMBEDDING_MIN_CONCURRENCY
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on calls in flight, shared by every thread and event loop in the process.
+
+    Each call completing within ``latency_target_ms`` raises the limit by
+    ``1 / limit`` (about one slot per window of successful calls); a throttled call
+    halves it, at most once per ``cooldown_s`` so a burst of throttles from one
+    window only counts once. Slow but successful calls hold the limit steady.
+    Waiting uses a ``threading.Condition``, so callers block on worker threads,
+    never on an event loop.
+    """
+
+    def __init__(
+        self,
+        initial: int = EMBEDDING_INITIAL_CONCURRENCY,
+        min_limit: int = EMBEDDING_MIN_CONCURRENCY,
+        max_limit: int = EMBEDDING_MAX_CONCURRENCY,
+        latency_target_ms: int = EMBEDDING_LATENCY_TARGET_MS,
+        backoff_factor: float = 0.5,
+        cooldown_s: float = 1.0,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError('Concurrency limits must satisfy 1 <= min <= max')
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target_ms / 1000
+        self.backoff_factor = backoff_factor
+        self.cooldown_s = cooldown_s
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._counters = {'successes': 0, 'throttles': 0, 'errors': 0}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def __enter__(self) -> AdaptiveConcurrencyLimiter:
+        """Take a slot, waiting while the limit is reached."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < int(self._limit))
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def record(self, latency_s: float, throttled: bool = False, failed: bool = False) -> None:
+        """Adjust the limit from the outcome of one call."""
+        with self._condition:
+            if throttled:
+                self._counters['throttles'] += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown_s:
+                    self._limit = max(self.min_limit, self._limit * self.backoff_factor)
+                    self._last_decrease = now
+            elif failed:
+                self._counters['errors'] += 1
+            else:
+                self._counters['successes'] += 1
+                if latency_s <= self.latency_target:
+                    self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                    # A higher limit may free a slot
+                    self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'limit': int(self._limit),
+                'in_flight': self._in_flight,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                **self._counters,
+            }
@@ -3,13 +3,21 @@ from __future__ import annotations
 import asyncio
 import json
 import time
+import uuid
+from collections import deque
 from concurrent.futures import as_completed
 from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import AsyncIterable
+from typing import AsyncIterator
+from typing import Deque
 from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import Tuple
 
-import boto3
+import numpy as np
 from opensearchpy import OpenSearch
 from opensearchpy import RequestsHttpConnection
 from opensearchpy.helpers import bulk
@@ -21,70 +29,126 @@ from .base import BaseStorage
 from .base import ChunkData
 from .base import EmbedderInput
 from .base import EmbedderOutput
+from .cache import EmbeddingCache
+from .client import BedrockRuntimeClient
+from .client import is_retryable_error
+from .config import BEDROCK_EMBEDDING_MODEL_ID
+from .config import EMBEDDING_BATCH_MAX_ITEMS
+from .config import EMBEDDING_BATCH_MAX_TOKENS
+from .config import EMBEDDING_CACHE_ENABLED
+from .config import EMBEDDING_DIMENSION
+from .config import EMBEDDING_DOCUMENT_DEADLINE_S
+from .config import EMBEDDING_INDEX_FLUSH_INTERVAL_S
+from .config import EMBEDDING_INDEX_FLUSH_SIZE
+from .config import EMBEDDING_INDEX_QUEUE_SIZE
+from .config import EMBEDDING_MAX_CONCURRENCY
+from .config import EMBEDDING_PIPELINE_DEPTH
+from .config import EMBEDDING_STREAM_BATCH_SIZE
 from .config import INDEX_NAME
 from .config import logger
-from .config import MAX_WORKERS
 from .config import OPENSEARCH_ENDPOINT
 from .config import OPENSEARCH_PASSWORD
 from .config import OPENSEARCH_USERNAME
 from .config import REGION_NAME
 
+# Bedrock embedding models that accept a list of texts per request
+MULTI_INPUT_MODEL_PREFIXES = ('cohere.embed',)
+# Fields added after the first indexes were created, also put into existing indexes
+ADDED_FIELD_MAPPINGS = {
+    'start': {'type': 'integer'},
+    'end': {'type': 'integer'},
+    'section_path': {'type': 'keyword'},
+    'content_hash': {'type': 'keyword'},
+    'upload_id': {'type': 'keyword'},
+}
+# Vectors kept per document for near-duplicates of its own chunks, about 8 MB at 1024-d
+RECENT_VECTORS = 2048
 
-class BedrockEmbeddingGenerator(BaseEmbeddingGenerator):
-    """Bedrock implementation of embedding generator."""
-
-    def __init__(self, region_name: str = REGION_NAME, max_workers: int = MAX_WORKERS):
-        self.bedrock = boto3.client('bedrock-runtime', region_name=region_name)
-        self.max_workers = max_workers
-        self.embedding_cache: dict[str, List[float]] = {}
-        self.semaphore = asyncio.Semaphore(max_workers)
-
-    async def get_embedding_batch(self, texts: List[str]) -> Dict[int, List[float]]:
-        """Generate embeddings for multiple texts using Bedrock."""
-
-        async def get_single_embedding(text: str, idx: int) -> tuple[int, Optional[List[float]]]:
-            async with self.semaphore:
-                if text in self.embedding_cache:
-                    return idx, self.embedding_cache[text]
 
-                model_id = 'amazon.titan-embed-text-v2:0'
-                body = {'inputText': text}
-
-                try:
-                    loop = asyncio.get_event_loop()
-                    response = await loop.run_in_executor(
-                        None,
-                        lambda: self.bedrock.invoke_model(
-                            modelId=model_id,
-                            body=json.dumps(body),
-                            contentType='application/json',
-                            accept='application/json',
-                        ),
-                    )
-
-                    result = json.loads(response['body'].read())
-                    embedding = result['embedding']
-                    self.embedding_cache[text] = embedding
-                    return idx, embedding
+class BedrockEmbeddingGenerator(BaseEmbeddingGenerator):
+    """Bedrock implementation of embedding generator.
 
-                except Exception as e:
-                    logger.error(f'Lỗi tạo embedding cho text {idx}: {e}')
-                    return idx, None
+    Cohere Embed models take up to ``batch_max_items`` texts per request and get
+    packed requests; other models (Titan) are called once per text, with up to
+    ``max_concurrency`` requests queued per call. Calls go through the process-wide
+    :class:`BedrockRuntimeClient`, whose adaptive limiter sets how many run at once
+    across all uploads.
+    """
 
-        tasks = [get_single_embedding(text, idx) for idx, text in enumerate(texts)]
+    def __init__(
+        self,
+        region_name: str = REGION_NAME,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+        model_id: str = BEDROCK_EMBEDDING_MODEL_ID,
+        batch_max_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+        batch_max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+        dimension: int = EMBEDDING_DIMENSION,
+        cache: Optional[EmbeddingCache] = None,
+        client: Optional[BedrockRuntimeClient] = None,
+    ):
+        super().__init__()
+        # A client passed in belongs to the caller, the shared one is shut down with this generator
+        self._owns_client = client is None
+        self.client = client or BedrockRuntimeClient.shared(region_name)
+        self.model_id = model_id
+        self.max_concurrency = max_concurrency
+        self.multi_input = model_id.startswith(MULTI_INPUT_MODEL_PREFIXES)
+        if self.multi_input:
+            self.max_batch_size = batch_max_items
+            self.max_batch_tokens = batch_max_tokens
+        self.dimension = dimension
+        if cache is None and EMBEDDING_CACHE_ENABLED:
+            cache = EmbeddingCache(model_id, dimension)
+        self.embedding_cache = cache
+
+    async def get_embedding_batch(self, texts: List[str], deadline: Optional[float] = None) -> Dict[int, List[float]]:
+        """Generate embeddings for multiple texts using Bedrock, cached texts are not sent."""
+        if self.embedding_cache is None:
+            return await super().get_embedding_batch(texts, deadline)
+
+        embeddings = await asyncio.to_thread(self.embedding_cache.get_many, texts)
+        missing = [idx for idx in range(len(texts)) if idx not in embeddings]
+        if not missing:
+            return embeddings
+
+        generated = await super().get_embedding_batch([texts[idx] for idx in missing], deadline)
+        new_embeddings = {}
+        for position, embedding in generated.items():
+            idx = missing[position]
+            new_embeddings[texts[idx]] = embedding
+            embeddings[idx] = embedding
+        await asyncio.to_thread(self.embedding_cache.put_many, new_embeddings)
+        return embeddings
+
+    async def embed_request(self, texts: List[str]) -> List[List[float]]:
+        if self.multi_input:
+            body = {'texts': texts, 'input_type': 'search_document', 'truncate': 'END'}
+        elif self.model_id.startswith('amazon.titan-embed-text-v2'):
+            body = {'inputText': texts[0], 'dimensions': self.dimension}
+        else:
+            body = {'inputText': texts[0]}
+
+        result = await self.client.invoke_model(
+            modelId=self.model_id,
+            body=json.dumps(body),
+            contentType='application/json',
+            accept='application/json',
+        )
+        if self.multi_input:
+            return result['embeddings']
+        return [result['embedding']]
 
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    def is_retryable(self, error: Exception) -> bool:
+        return is_retryable_error(error)
 
-        # Process results
-        embeddings = {}
-        for result in results:
-            if isinstance(result, Exception):
-                logger.error(f'Task failed with exception: {result}')
-                continue
-            idx, embedding = result  # type: ignore
-            embeddings[idx] = embedding
+    def metrics(self) -> Dict[str, Any]:
+        return {**super().metrics(), 'limiter': self.client.limiter.snapshot()}
 
-        return embeddings  # type: ignore
+    def shutdown(self) -> None:
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+        if self._owns_client:
+            self.client.shutdown()
 
 
 class OpenSearchStorage(BaseStorage):
@@ -98,6 +162,9 @@ class OpenSearchStorage(BaseStorage):
         index_name: str = INDEX_NAME,
     ):
         self.index_name = index_name
+        # Vector reuse needs content_hash mapped as a keyword
+        self.content_hash_searchable = True
+        self._mapping_checked = False
 
         if endpoint is None:
             raise ValueError('OPENSEARCH_ENDPOINT is required')
@@ -130,6 +197,8 @@ class OpenSearchStorage(BaseStorage):
         """Create optimized index for OpenSearch."""
         if self.client.indices.exists(index=self.index_name):
             logger.info(f'Index {self.index_name} đã tồn tại.')
+            if not self._mapping_checked:
+                self.add_missing_mappings()
             return
 
         mapping = {
@@ -156,7 +225,7 @@ class OpenSearchStorage(BaseStorage):
                     },
                     'embedding_vector': {
                         'type': 'knn_vector',
-                        'dimension': 1024,
+                        'dimension': EMBEDDING_DIMENSION,
                         'method': {
                             'name': 'hnsw',
                             'space_type': 'cosinesimil',
@@ -180,6 +249,7 @@ class OpenSearchStorage(BaseStorage):
                     'type': {'type': 'keyword'},
                     'content_json': {'type': 'object', 'enabled': False},
                     'heading_level': {'type': 'integer'},
+                    **ADDED_FIELD_MAPPINGS,
                 },
             },
         }
@@ -191,70 +261,113 @@ class OpenSearchStorage(BaseStorage):
             logger.error(f'Lỗi tạo index: {e}')
             raise
 
-    def get_max_id(self) -> int:
+    def add_missing_mappings(self) -> None:
+        """Put the fields added since the index was created into its mapping.
+
+        New fields are simply added; a field already mapped with another type (e.g.
+        ``content_hash`` dynamically mapped as text) cannot be changed, and vector
+        reuse is then turned off until the index is recreated.
+        """
+        self._mapping_checked = True
+        try:
+            self.client.indices.put_mapping(index=self.index_name, body={'properties': ADDED_FIELD_MAPPINGS})
+        except Exception as e:
+            self.content_hash_searchable = False
+            logger.warning(
+                f'Không cập nhật được mapping của index {self.index_name}, '
+                f'tắt dùng lại embedding theo content_hash cho đến khi tạo lại index: {e}',
+            )
+
+    def get_embeddings_by_content_hash(self, content_hashes: List[str]) -> Dict[str, List[float]]:
+        unique_hashes = list(dict.fromkeys(content_hashes))
+        if not unique_hashes or not self.content_hash_searchable:
+            return {}
         try:
             body = {
-                'size': 0,
-                'aggs': {
-                    'max_id': {'max': {'field': 'id'}},
-                },
+                'size': len(unique_hashes),
+                'query': {'terms': {'content_hash': unique_hashes}},
+                # One hit per hash, a chunk may have been indexed by several uploads
+                'collapse': {'field': 'content_hash'},
+                '_source': ['content_hash', 'embedding_vector'],
             }
             res = self.client.search(index=self.index_name, body=body)
-            max_id = res['aggregations']['max_id']['value']
-            return int(max_id) if max_id is not None else 0
+            return {
+                hit['_source']['content_hash']: hit['_source']['embedding_vector']
+                for hit in res['hits']['hits']
+            }
         except Exception as e:
-            logger.error(f'Lỗi lấy max id: {e}')
-            return 0
-
-    def bulk_index_chunks(self, chunks: List[ChunkData], embeddings: Dict[int, List[float]]) -> None:
-        actions = []
-        successful_count = 0
-
-        max_id = self.get_max_id()
-
-        for idx, chunk in enumerate(chunks):
-            embedding = embeddings.get(idx)
-            if embedding is None:
-                logger.warning('Bỏ qua chunk vì lỗi embedding.')
-                continue
+            logger.error(f'Lỗi lấy embedding theo content hash: {e}')
+            return {}
 
-            chunk_id = max_id + idx + 1
-
-            action = {
-                '_index': self.index_name,
-                '_id': chunk_id,
-                '_source': {
-                    'id': chunk_id,
-                    'content': chunk.content,
-                    'embedding_vector': embedding,
-                    'filename': chunk.filename,
-                    'position': chunk.position,
-                    'tokens': chunk.tokens,
-                    'section_title': chunk.section_title,
-                    'type': chunk.type,
-                    'content_json': chunk.content_json,
-                    'heading_level': chunk.heading_level,
-                },
-            }
-            actions.append(action)
-            successful_count += 1
+    def bulk_index_chunks(
+        self,
+        chunks: List[ChunkData],
+        embeddings: Dict[int, List[float]],
+        refresh: bool = True,
+        upload_id: Optional[str] = None,
+    ) -> None:
+        upload_id = upload_id or uuid.uuid4().hex
+
+        def _actions() -> Iterator[Dict[str, Any]]:
+            for idx, chunk in enumerate(chunks):
+                embedding = embeddings.get(idx)
+                if embedding is None:
+                    logger.warning('Bỏ qua chunk vì lỗi embedding.')
+                    continue
+
+                yield {
+                    '_index': self.index_name,
+                    '_id': self.document_id(chunk, upload_id),
+                    '_source': {
+                        'id': chunk.id,
+                        'upload_id': upload_id,
+                        'content': chunk.text,
+                        'start': chunk.start,
+                        'end': chunk.end,
+                        'section_path': chunk.section_path,
+                        'content_hash': chunk.content_hash,
+                        'embedding_vector': embedding,
+                        'filename': chunk.filename,
+                        'position': chunk.position,
+                        'tokens': chunk.tokens,
+                        'section_title': chunk.section_title,
+                        'type': chunk.type,
+                        'content_json': chunk.content_json,
+                        'heading_level': chunk.heading_level,
+                    },
+                }
 
-        logger.info(f'Đang bulk index {len(actions)} documents...')
+        logger.info(f'Đang bulk index {len(chunks)} documents...')
         try:
             success, failed = bulk(
                 self.client,
-                actions,
+                _actions(),
                 index=self.index_name,
                 chunk_size=100,
                 request_timeout=120,
                 max_retries=5,
             )
             logger.info(f'Bulk index hoàn thành: {success} thành công, {len(failed)} thất bại')
-            self.client.indices.refresh(index=self.index_name)
+            if refresh:
+                self.refresh()
         except Exception as e:
             logger.error(f'Lỗi bulk index: {e}')
             raise
 
+    def refresh(self) -> None:
+        self.client.indices.refresh(index=self.index_name)
+
+    def delete_chunks(self, ids: List[str]) -> None:
+        # Deletes by _id are realtime, no refresh needed to see unrefreshed writes
+        success, failed = bulk(
+            self.client,
+            ({'_op_type': 'delete', '_index': self.index_name, '_id': chunk_id} for chunk_id in ids),
+            chunk_size=500,
+            raise_on_error=False,
+            refresh=True,
+        )
+        logger.info(f'Đã xoá {success} chunks, {len(failed)} không xoá được')
+
 
 class EmbedderService(BaseEmbedderService):
     """Main embedder service that orchestrates the embedding process."""
@@ -267,10 +380,102 @@ class EmbedderService(BaseEmbedderService):
         self.embedding_generator = embedding_generator or BedrockEmbeddingGenerator()
         self.storage = storage or OpenSearchStorage()
 
+    def shutdown(self) -> None:
+        self.embedding_generator.shutdown()
+
+    async def _embed_chunks(
+        self,
+        chunks: List[ChunkData],
+        deadline: Optional[float] = None,
+        recent: Optional[Dict[str, np.ndarray]] = None,
+    ) -> Dict[int, List[float]]:
+        """Embed chunks, reusing the vector of the chunk each near-duplicate was flagged against.
+
+        The original is looked up among the ``recent`` vectors of the document, then
+        earlier in the batch, then in the index; when it is not found the chunk is
+        embedded itself.
+        """
+        batch_positions = {chunk.content_hash: idx for idx, chunk in enumerate(chunks) if chunk.content_hash}
+        embeddings: Dict[int, List[float]] = {}
+        in_batch: List[int] = []
+        stored: List[int] = []
+        for idx, chunk in enumerate(chunks):
+            original = chunk.near_duplicate_of
+            if not original:
+                continue
+            if recent is not None and original in recent:
+                embeddings[idx] = recent[original].tolist()
+            elif batch_positions.get(original, idx) < idx:
+                in_batch.append(idx)
+            else:
+                stored.append(idx)
+
+        if stored:
+            reused = await asyncio.to_thread(
+                self.storage.get_embeddings_by_content_hash, [chunks[idx].near_duplicate_of for idx in stored],
+            )
+            for idx in stored:
+                vector = reused.get(chunks[idx].near_duplicate_of)
+                if vector is not None:
+                    embeddings[idx] = vector
+
+        waiting = set(in_batch)
+        pending = [idx for idx in range(len(chunks)) if idx not in embeddings and idx not in waiting]
+        if pending:
+            generated = await self.embedding_generator.get_embedding_batch(
+                [chunks[idx].text for idx in pending], deadline,
+            )
+            for position, idx in enumerate(pending):
+                if position in generated:
+                    embeddings[idx] = generated[position]
+
+        # Originals come first in the batch, so chains of near-duplicates resolve in order
+        for idx in in_batch:
+            vector = embeddings.get(batch_positions[chunks[idx].near_duplicate_of])
+            if vector is not None:
+                embeddings[idx] = vector
+        reused_count = len(chunks) - len(pending)
+        if reused_count:
+            logger.info(f'Dùng lại embedding cho {reused_count} chunks gần trùng lặp')
+
+        if recent is not None:
+            for idx, vector in embeddings.items():
+                if chunks[idx].content_hash:
+                    recent[chunks[idx].content_hash] = np.asarray(vector, dtype=np.float32)
+            while len(recent) > RECENT_VECTORS:
+                del recent[next(iter(recent))]
+        return embeddings
+
     async def process(self, input_data: EmbedderInput) -> EmbedderOutput:
         """Process multiple chunks with embeddings and storage."""
+
+        async def _chunks() -> AsyncIterator[ChunkData]:
+            for chunk in input_data.chunks:
+                yield chunk
+
+        return await self.process_stream(_chunks())
+
+    async def process_stream(
+        self,
+        chunks: AsyncIterable[ChunkData],
+        batch_size: int = EMBEDDING_STREAM_BATCH_SIZE,
+    ) -> EmbedderOutput:
+        """Embed chunks as they arrive and stream the vectors into the index.
+
+        Up to ``EMBEDDING_PIPELINE_DEPTH`` batches are embedded at once; finished
+        batches are queued in document order on a bounded queue that a bulk indexer
+        drains, flushing every ``EMBEDDING_INDEX_FLUSH_SIZE`` chunks or
+        ``EMBEDDING_INDEX_FLUSH_INTERVAL_S`` seconds. Memory is bounded by the
+        batches in flight plus the queue, whatever the document size.
+
+        Every run indexes its chunks under its own ``upload_id``. When the document
+        fails, exactly the chunks this run flushed are deleted, so a failed upload
+        leaves nothing in the index and other uploads of the same file are untouched.
+        """
+        upload_id = uuid.uuid4().hex
+        # Storage ids of the chunks already sent to the index
+        flushed: List[str] = []
         try:
-            # Test connection first
             if not self.storage.test_connection():
                 logger.error('Không thể kết nối với opensearch')
                 return EmbedderOutput(
@@ -278,30 +483,126 @@ class EmbedderService(BaseEmbedderService):
                     num_embeddings=0,
                 )
 
-            # Create index if not exists
             self.storage.create_optimized_index()
-            chunks = input_data.chunks
-            # Process embeddings
             start_time = time.time()
-            texts = [chunk.content for chunk in chunks]
-            logger.info(f'Đang tạo embedding cho {len(texts)} chunks...')
-
-            embeddings = await self.embedding_generator.get_embedding_batch(texts)
-
-            # Store in backend
-            self.storage.bulk_index_chunks(chunks, embeddings)
+            # Retries of every batch of the document share one deadline
+            deadline = time.monotonic() + EMBEDDING_DOCUMENT_DEADLINE_S
+            queue: asyncio.Queue = asyncio.Queue(maxsize=EMBEDDING_INDEX_QUEUE_SIZE)
+            # Vectors of the latest chunks, for near-duplicates of chunks of this document
+            recent: Dict[str, np.ndarray] = {}
+            indexer = asyncio.ensure_future(self._index_from_queue(queue, upload_id, flushed))
+            embedding: Deque[asyncio.Future] = deque()
+
+            async def _embed(batch: List[ChunkData]) -> List[Tuple[ChunkData, List[float]]]:
+                logger.info(f'Đang tạo embedding cho {len(batch)} chunks...')
+                embeddings = await self._embed_chunks(batch, deadline, recent)
+                return [(chunk, embeddings[idx]) for idx, chunk in enumerate(batch) if idx in embeddings]
+
+            async def _drain_oldest() -> None:
+                # Oldest first, so chunks reach the index in document order
+                for item in await embedding.popleft():
+                    await self._enqueue(queue, item, indexer)
+
+            try:
+                batch: List[ChunkData] = []
+                async for chunk in chunks:
+                    batch.append(chunk)
+                    if len(batch) >= batch_size:
+                        embedding.append(asyncio.ensure_future(_embed(batch)))
+                        batch = []
+                        if len(embedding) >= EMBEDDING_PIPELINE_DEPTH:
+                            await _drain_oldest()
+                if batch:
+                    embedding.append(asyncio.ensure_future(_embed(batch)))
+                while embedding:
+                    await _drain_oldest()
+
+                await self._enqueue(queue, None, indexer)
+                num_embeddings = await indexer
+            finally:
+                for future in (*embedding, indexer):
+                    future.cancel()
+                # Let an interrupted bulk write finish, so a cleanup sees its chunks
+                await asyncio.gather(*embedding, indexer, return_exceptions=True)
 
             end_time = time.time()
             logger.info(f'Thời gian xử lý: {end_time - start_time:.2f} giây')
 
             return EmbedderOutput(
                 index_name=self.storage.index_name,
-                num_embeddings=len(chunks),
+                num_embeddings=num_embeddings,
             )
 
         except Exception as e:
             logger.error(f'Lỗi xử lý chunks: {e}')
+            if flushed:
+                try:
+                    await asyncio.to_thread(self.storage.delete_chunks, flushed)
+                except Exception as delete_error:
+                    logger.error(f'Lỗi xoá {len(flushed)} chunks đã index: {delete_error}')
             return EmbedderOutput(
                 index_name=None,
                 num_embeddings=0,
             )
+
+    @staticmethod
+    async def _enqueue(queue: asyncio.Queue, item: Any, indexer: asyncio.Future) -> None:
+        """Put on the queue, raising the indexer's error instead of waiting forever if it died."""
+        put = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait({put, indexer}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            indexer.result()
+
+    async def _index_from_queue(self, queue: asyncio.Queue, upload_id: str, flushed: List[str]) -> int:
+        """Bulk index queued (chunk, vector) pairs until the ``None`` sentinel, return the count.
+
+        The storage ids of flushed chunks are added to ``flushed`` before each bulk write.
+        """
+        loop = asyncio.get_running_loop()
+        indexed = 0
+        buffer: List[Tuple[ChunkData, List[float]]] = []
+        flush_at: Optional[float] = None
+        done = False
+        # One pending get across timeouts: cancelling a get that races with a put can lose the item
+        getter: Optional[asyncio.Future] = None
+
+        try:
+            while not done:
+                if getter is None:
+                    getter = asyncio.ensure_future(queue.get())
+                timeout = None if flush_at is None else max(0.0, flush_at - loop.time())
+                finished, _ = await asyncio.wait({getter}, timeout=timeout)
+                if finished:
+                    item = getter.result()
+                    getter = None
+                    if item is None:
+                        done = True
+                    else:
+                        if not buffer:
+                            flush_at = loop.time() + EMBEDDING_INDEX_FLUSH_INTERVAL_S
+                        buffer.append(item)
+
+                if buffer and (done or len(buffer) >= EMBEDDING_INDEX_FLUSH_SIZE or loop.time() >= flush_at):
+                    batch = [chunk for chunk, _ in buffer]
+                    embeddings = {idx: vector for idx, (_, vector) in enumerate(buffer)}
+                    buffer = []
+                    flush_at = None
+                    flushed.extend(self.storage.document_id(chunk, upload_id) for chunk in batch)
+                    write = asyncio.ensure_future(
+                        asyncio.to_thread(self.storage.bulk_index_chunks, batch, embeddings, False, upload_id),
+                    )
+                    try:
+                        await asyncio.shield(write)
+                    except asyncio.CancelledError:
+                        # The worker thread keeps writing after a cancel, wait for it
+                        await asyncio.wait({write})
+                        raise
+                    indexed += len(batch)
+        finally:
+            if getter is not None:
+                getter.cancel()
+
+        if indexed:
+            await asyncio.to_thread(self.storage.refresh)
+        return indexed
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# PDF extraction
+PDF_MAX_WORKERS = int(os.getenv('PDF_MAX_WORKERS', '4'))
+PDF_EXECUTOR = os.getenv('PDF_EXECUTOR', 'thread').lower()  # 'thread' or 'process'
+
+# OCR
+OCR_MAX_WORKERS = int(os.getenv('OCR_MAX_WORKERS', str(os.cpu_count() or 1)))  # 0 runs OCR inline
+OCR_BATCH_SIZE = int(os.getenv('OCR_BATCH_SIZE', '16'))
+OCR_LANG = os.getenv('OCR_LANG', 'vie')
+OCR_FALLBACK_LANG = os.getenv('OCR_FALLBACK_LANG', 'eng') or None
+OCR_TESSDATA_PATH = os.getenv('OCR_TESSDATA_PATH')
+# 'cells' OCRs every cell crop, 'layout' OCRs a table once and maps word boxes to cells
+OCR_TABLE_MODE = os.getenv('OCR_TABLE_MODE', 'cells').lower()
+
+# PDF rasterization for the OCR fallback
+RASTER_DPI = int(os.getenv('RASTER_DPI', '300'))
+RASTER_MIN_DPI = int(os.getenv('RASTER_MIN_DPI', '200'))
+RASTER_MAX_PIXELS = int(os.getenv('RASTER_MAX_PIXELS', str(2480 * 3508)))  # A4 at 300 DPI
+RASTER_BATCH_PAGES = int(os.getenv('RASTER_BATCH_PAGES', '8'))
+RASTER_GRAYSCALE = os.getenv('RASTER_GRAYSCALE', 'true').lower() == 'true'
+
+# XLSX extraction, large sheets are emitted as several tables of at most this size
+XLSX_BLOCK_ROWS = int(os.getenv('XLSX_BLOCK_ROWS', '200'))
+XLSX_BLOCK_CHARS = int(os.getenv('XLSX_BLOCK_CHARS', '6000'))
+
+# Header detection: 'full' sends the whole text to the LLM, 'windowed' only candidate header
+# lines split into overlapping windows, 'auto' switches to windowed for long documents
+HEADER_DETECTION_MODE = os.getenv('HEADER_DETECTION_MODE', 'auto').lower()
+HEADER_FULL_MAX_CHARS = int(os.getenv('HEADER_FULL_MAX_CHARS', '20000'))
+HEADER_WINDOW_LINES = int(os.getenv('HEADER_WINDOW_LINES', '300'))
+HEADER_WINDOW_OVERLAP = int(os.getenv('HEADER_WINDOW_OVERLAP', '20'))
+HEADER_WINDOW_CONCURRENCY = int(os.getenv('HEADER_WINDOW_CONCURRENCY', '4'))
+HEADER_WINDOW_MAX_TOKENS = int(os.getenv('HEADER_WINDOW_MAX_TOKENS', '2048'))
+
+# Rule-based header detection, the LLM is skipped when the numbering is this consistent
+HEADER_RULES_ENABLED = os.getenv('HEADER_RULES_ENABLED', 'true').lower() == 'true'
+HEADER_RULES_MIN_CONFIDENCE = float(os.getenv('HEADER_RULES_MIN_CONFIDENCE', '0.9'))
+HEADER_RULES_MIN_HEADERS = int(os.getenv('HEADER_RULES_MIN_HEADERS', '3'))
@@ -3,9 +3,16 @@ from __future__ import annotations
 import os
 import threading
 from concurrent.futures import as_completed
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
 from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 from io import BytesIO
+from typing import Dict
+from typing import Iterator
 from typing import List
+from typing import Optional
 from typing import Tuple
 
 import cv2
@@ -13,20 +20,56 @@ import docx
 import numpy as np
 import openpyxl
 import pdfplumber
-import pytesseract
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
 from fastapi import UploadFile
-from pdf2image import convert_from_bytes
 from pdfplumber.utils import extract_text
 from pdfplumber.utils import get_bbox_overlap
 from pdfplumber.utils import obj_to_bbox
 from PIL import Image
 
 from .base import FileType
+from .config import OCR_TABLE_MODE
+from .config import PDF_EXECUTOR
+from .config import PDF_MAX_WORKERS
+from .config import XLSX_BLOCK_CHARS
+from .config import XLSX_BLOCK_ROWS
+from .ocr import OcrEngine
+from .rasterizer import choose_page_dpi
+from .rasterizer import PageRasterizer
+from .rasterizer import RasterRequest
+from .table_layout import assign_words_to_cells
+from .table_layout import CellBox
+
+DOCX_PARAGRAPH_TAG = qn('w:p')
+DOCX_TABLE_TAG = qn('w:tbl')
 
 
 class ExtractorService:
     """Service for extracting raw text from various file formats."""
 
+    def __init__(
+        self,
+        max_workers: int = PDF_MAX_WORKERS,
+        executor: str = PDF_EXECUTOR,
+        ocr_engine: Optional[OcrEngine] = None,
+        table_ocr_mode: str = OCR_TABLE_MODE,
+    ):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f'Unsupported PDF executor: {executor}')
+        if table_ocr_mode not in ('cells', 'layout'):
+            raise ValueError(f'Unsupported table OCR mode: {table_ocr_mode}')
+        self.table_ocr_mode = table_ocr_mode
+        self.max_workers = max(1, max_workers)
+        self.executor = executor
+        self.ocr_engine = ocr_engine or OcrEngine()
+        self.rasterizer = PageRasterizer()
+
+    def shutdown(self) -> None:
+        """Stop the OCR worker pool."""
+        self.ocr_engine.shutdown()
+
     def extract(self, file: UploadFile) -> str:
         """Extract raw text from the given file based on its format."""
         file_type = self.get_file_type(file)
@@ -70,37 +113,41 @@ class ExtractorService:
         try:
             file.file.seek(0)
             document = docx.Document(file.file)
-            content = []
 
-            # Extract paragraphs and tables in document order
-            for element in document.element.body:
-                if element.tag.endswith('p'):  # Paragraph
-                    # Find corresponding paragraph object
-                    for para in document.paragraphs:
-                        if para._element == element:
-                            text = para.text.strip()
-                            if text:
-                                content.append(text)
-                            break
-                elif element.tag.endswith('tbl'):  # Table
-                    # Find corresponding table object
-                    for table in document.tables:
-                        if table._element == element:
-                            md_table = self.__docx_table_to_markdown(table)
-                            if md_table:
-                                content.append(md_table)
-                            break
-
-            # Handle images (stub)
-            for rel in document.part.rels.values():
-                if 'image' in rel.target_ref:
-                    image_content = self.__ocr_image(np.array(Image.open(BytesIO(rel.target_part.blob))))
-                    content.append(image_content)
+            image_blobs = [
+                rel.target_part.blob
+                for rel in document.part.rels.values()
+                if 'image' in rel.target_ref
+            ]
+            if not image_blobs:
+                return '\n\n'.join(self.iter_docx_blocks(document))
+
+            # OCR embedded images in the background while the body is walked
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                image_futures = [executor.submit(self.__ocr_image_bytes, blob) for blob in image_blobs]
+                content = list(self.iter_docx_blocks(document))
+                content.extend(future.result() for future in image_futures)
 
             return '\n\n'.join(content)
         except Exception as e:
             raise ValueError(f'Failed to extract text from DOCX file: {str(e)}')
 
+    def iter_docx_blocks(self, document) -> Iterator[str]:
+        """Yield the paragraphs and tables of a DOCX body as Markdown blocks, in document order."""
+        body = document._body
+        for element in document.element.body.iterchildren():
+            if element.tag == DOCX_PARAGRAPH_TAG:
+                text = Paragraph(element, body).text.strip()
+                if text:
+                    yield text
+            elif element.tag == DOCX_TABLE_TAG:
+                md_table = self.__docx_table_to_markdown(Table(element, body))
+                if md_table:
+                    yield md_table
+
+    def __ocr_image_bytes(self, blob: bytes) -> str:
+        return self.__ocr_image(np.array(Image.open(BytesIO(blob)).convert('RGB')))
+
     def __docx_table_to_markdown(self, table) -> str:
         """Convert DOCX table to Markdown format."""
         if not table.rows:
@@ -125,51 +172,90 @@ class ExtractorService:
 
         return '\n'.join([header, separator] + body_rows)
 
-    def __convert_pdf_page_to_image(self, file_byte: bytes, page_number: int) -> np.ndarray:
-        """Convert PDF file bytes to a single PIL Image object."""
-        try:
-            image = convert_from_bytes(pdf_file=file_byte, first_page=page_number, last_page=page_number, dpi=300, fmt='jpg')[0]
-            return np.array(image)
-        except Exception as e:
-            raise ValueError(f'Failed to convert PDF to images: {str(e)}')
+    def __process_page(self, page, page_index: int) -> Tuple[str, Optional[RasterRequest]]:
+        """Extract text and tables from an already opened pdfplumber page.
+
+        Pages without a text layer come back empty together with a request to rasterize
+        them for OCR.
+        """
+        filtered_page = page
+        chars = filtered_page.chars
+
+        for table in page.find_tables():
+            table_chars = page.crop(table.bbox).chars
+            if not table_chars:
+                continue
+            first_table_char = table_chars[0]
+            filtered_page = filtered_page.filter(
+                lambda obj: get_bbox_overlap(obj_to_bbox(obj), table.bbox) is None,
+            )
+            chars = filtered_page.chars
+            markdown = self.__table_to_markdown(table.extract())
+            chars.append(first_table_char | {'text': markdown})
 
-    def __process_single_page(self, page_data: Tuple[int, bytes, UploadFile]) -> Tuple[int, str]:
-        page_index, file_byte, file = page_data
-        try:
-            with pdfplumber.open(BytesIO(file_byte)) as pdf:
-                if page_index >= len(pdf.pages):
-                    raise IndexError('Page index out of range')
+        page_text = extract_text(chars, layout=True)
 
-                page = pdf.pages[page_index]
-                filtered_page = page
-                chars = filtered_page.chars
-
-                for table in page.find_tables():
-                    table_chars = page.crop(table.bbox).chars
-                    if not table_chars:
-                        continue
-                    first_table_char = table_chars[0]
-                    filtered_page = filtered_page.filter(
-                        lambda obj: get_bbox_overlap(obj_to_bbox(obj), table.bbox) is None,
-                    )
-                    chars = filtered_page.chars
-                    markdown = self.__table_to_markdown(table.extract())
-                    chars.append(first_table_char | {'text': markdown})
-
-                page_text = extract_text(chars, layout=True)
-
-                if not page_text:
-                    page_text = ''
-                    image = self.__convert_pdf_page_to_image(file_byte, page_index + 1)
-                    ocr_text = self.__ocr_image(image)
-                    if ocr_text:
-                        page_text += ocr_text + '\n'
+        if not page_text:
+            return '', RasterRequest(page_index=page_index, dpi=choose_page_dpi(page))
 
-            return (page_index, page_text)
+        return page_text, None
 
-        except Exception as e:
-            print(f'Lỗi xử lý trang {page_index + 1}: {str(e)}')
-            return (page_index, '')
+    def extract_pdf_page_range(
+        self, file_byte: bytes, start: int, end: int,
+    ) -> List[Tuple[int, str, Optional[RasterRequest]]]:
+        """Extract pages [start, end) of a PDF, opening the document only once."""
+        results = []
+        with pdfplumber.open(BytesIO(file_byte)) as pdf:
+            for page_index in range(start, min(end, len(pdf.pages))):
+                page = pdf.pages[page_index]
+                raster_request = None
+                try:
+                    page_text, raster_request = self.__process_page(page, page_index)
+                except Exception as e:
+                    print(f'Lỗi xử lý trang {page_index + 1}: {str(e)}')
+                    page_text = ''
+                finally:
+                    # Drop cached layout objects, the range walker keeps the document open
+                    page.flush_cache()
+                results.append((page_index, page_text, raster_request))
+        return results
+
+    def __partition_pages(self, total_pages: int) -> List[Tuple[int, int]]:
+        """Split pages into contiguous ranges, one per worker."""
+        num_parts = max(1, min(self.max_workers, total_pages))
+        size, remainder = divmod(total_pages, num_parts)
+        ranges = []
+        start = 0
+        for part in range(num_parts):
+            end = start + size + (1 if part < remainder else 0)
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    def __ocr_pdf_pages(self, file_byte: bytes, raster_requests: List[RasterRequest]) -> Dict[int, str]:
+        """OCR rasterized pages as they stream out of the rasterizer, a few pages in flight."""
+        results: Dict[int, str] = {}
+        in_flight: Dict[Future, int] = {}
+
+        def _collect(done) -> None:
+            for future in done:
+                page_index = in_flight.pop(future)
+                try:
+                    results[page_index] = future.result()
+                except Exception as e:
+                    print(f'Lỗi xử lý trang {page_index + 1}: {str(e)}')
+                    results[page_index] = ''
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for page_index, image in self.rasterizer.iter_pages(file_byte, raster_requests):
+                # Bound the number of rendered frames held in memory
+                if len(in_flight) >= self.max_workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    _collect(done)
+                in_flight[executor.submit(self.__ocr_image, image)] = page_index
+            _collect(wait(in_flight).done)
+
+        return results
 
     def extract_pdf(self, file: UploadFile) -> str:
         """Extract from a PDF file."""
@@ -180,27 +266,39 @@ class ExtractorService:
             with pdfplumber.open(BytesIO(file_byte)) as pdf:
                 total_pages = len(pdf.pages)
 
-            page_data_list = [(i, file_byte, file) for i in range(total_pages)]
-
-            results = {}
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                future_to_index = {
-                    executor.submit(self.__process_single_page, page_data): page_data[0]
-                    for page_data in page_data_list
-                }
+            page_ranges = self.__partition_pages(total_pages)
 
-                for future in as_completed(future_to_index):
-                    try:
-                        page_index, page_text = future.result()
-                        results[page_index] = page_text.strip()
-                    except Exception as e:
-                        page_index = future_to_index[future]
-                        print(f'Lỗi xử lý trang {page_index + 1}: {str(e)}')
-                        results[page_index] = ''
+            page_results = []
+            if len(page_ranges) == 1:
+                start, end = page_ranges[0]
+                page_results.extend(self.extract_pdf_page_range(file_byte, start, end))
+            else:
+                executor_class = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+                with executor_class(max_workers=len(page_ranges)) as executor:
+                    future_to_range = {
+                        executor.submit(_extract_page_range, self, file_byte, start, end): (start, end)
+                        for start, end in page_ranges
+                    }
+
+                    for future in as_completed(future_to_range):
+                        try:
+                            page_results.extend(future.result())
+                        except Exception as e:
+                            start, end = future_to_range[future]
+                            print(f'Lỗi xử lý trang {start + 1}-{end}: {str(e)}')
+                            page_results.extend((page_index, '', None) for page_index in range(start, end))
+
+            results = {page_index: page_text for page_index, page_text, _ in page_results}
+
+            # Pages without a text layer are rendered in batches and OCR-ed as they arrive
+            raster_requests = [request for _, _, request in page_results if request is not None]
+            for page_index, ocr_text in self.__ocr_pdf_pages(file_byte, raster_requests).items():
+                if ocr_text:
+                    results[page_index] = ocr_text + '\n'
 
             content = []
             for i in sorted(results.keys()):
-                content.append(results[i])
+                content.append(results[i].strip())
 
             return '\n'.join(content)
 
@@ -240,7 +338,7 @@ class ExtractorService:
 
     def __ocr_image(self, image: np.ndarray) -> str:
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
             # Làm mờ để giảm nhiễu
             blurred = cv2.GaussianBlur(gray, (5, 5), 0)
@@ -285,29 +383,15 @@ class ExtractorService:
                     text_y = y + (h + text_size[1]) // 2
                     cv2.putText(image, text, (text_x, text_y), font, font_scale, (0, 0, 0), thickness)
 
-            custom_config = r'--oem 3 --psm 6 -l vie'
-            page_content = pytesseract.image_to_string(image, config=custom_config)
-
-            # If Vietnamese fails, try English only
-            if not page_content:
-                custom_config = r'--oem 3 --psm 6 -l eng'
-                page_content = pytesseract.image_to_string(image, config=custom_config)
-
-            table_contents = []
-            for table_image in table_images:
-                cells = self.__extract_cells_from_table(table_image)
-                table_data = []
-                for row in cells:
-                    row_data = []
-                    for cell in row:
-                        cell_content = pytesseract.image_to_string(cell, config=custom_config)
-                        # Cho phép xuống dòng trong ô:
-                        cell_content = cell_content.replace('\n', '<br>')
-                        row_data.append(cell_content)
-                    table_data.append(row_data)
-
-                markdown = self.__table_to_markdown(table_data)
-                table_contents.append(markdown)
+            # Recognize the page text while the tables are OCR-ed on the pool
+            page_future = self.ocr_engine.submit(image, kind='page')
+
+            if self.table_ocr_mode == 'layout':
+                table_contents = self.__ocr_tables_by_layout(table_images)
+            else:
+                table_contents = self.__ocr_tables_by_cells(table_images)
+
+            page_content = page_future.result()
 
             for content in table_contents:
                 page_content = page_content.replace('table here', content, 1)
@@ -317,8 +401,44 @@ class ExtractorService:
         except Exception as e:
             raise ValueError(f'Failed to extract text from image: {str(e)}')
 
+    def __ocr_tables_by_cells(self, table_images: List[np.ndarray]) -> List[str]:
+        """OCR every cell crop of every table as its own region."""
+        tables_cells = [self.__extract_cells_from_table(table_image) for table_image in table_images]
+        cell_images = [cell for cells in tables_cells for row in cells for cell in row]
+        cell_texts = iter(self.ocr_engine.recognize_batch(cell_images, kind='cell'))
+
+        table_contents = []
+        for cells in tables_cells:
+            table_data = []
+            for row in cells:
+                row_data = []
+                for _ in row:
+                    # Cho phép xuống dòng trong ô:
+                    cell_content = next(cell_texts).replace('\n', '<br>')
+                    row_data.append(cell_content)
+                table_data.append(row_data)
+
+            table_contents.append(self.__table_to_markdown(table_data))
+        return table_contents
+
+    def __ocr_tables_by_layout(self, table_images: List[np.ndarray]) -> List[str]:
+        """OCR each table once and distribute the word boxes over the detected cells."""
+        tables_words = self.ocr_engine.recognize_words_batch(table_images, kind='table')
+
+        table_contents = []
+        for table_image, words in zip(table_images, tables_words):
+            table_data = assign_words_to_cells(words, self.__detect_cell_boxes(table_image))
+            table_contents.append(self.__table_to_markdown(table_data))
+        return table_contents
+
     def __extract_cells_from_table(self, table_image: np.ndarray):
-        gray = cv2.cvtColor(table_image, cv2.COLOR_BGR2GRAY)
+        return [
+            [table_image[y:y + h, x:x + w] for (x, y, w, h) in row]
+            for row in self.__detect_cell_boxes(table_image)
+        ]
+
+    def __detect_cell_boxes(self, table_image: np.ndarray) -> List[List[CellBox]]:
+        gray = table_image if table_image.ndim == 2 else cv2.cvtColor(table_image, cv2.COLOR_BGR2GRAY)
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
         contrast = clahe.apply(gray)
         blur = cv2.GaussianBlur(contrast, (3, 3), 0)
@@ -383,13 +503,7 @@ class ExtractorService:
             rows.append(current_row)
 
         # Sắp xếp các ô trong từng hàng theo x
-        cells = []
-        for row in rows:
-            row_sorted = sorted(row, key=lambda b: b[0])
-            row_imgs = [table_image[y:y + h, x:x + w] for (x, y, w, h) in row_sorted]
-            cells.append(row_imgs)
-
-        return cells
+        return [sorted(row, key=lambda b: b[0]) for row in rows]
 
     def extract_image(self, file: UploadFile) -> str:
         """Extract from an image file using OCR."""
@@ -407,45 +521,77 @@ class ExtractorService:
         """Extract raw text from an XLSX file and convert tables to Markdown."""
         try:
             file.file.seek(0)
-            workbook = openpyxl.load_workbook(BytesIO(file.file.read()))
-            content = []
-
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-
-                # Add sheet name as header
-                content.append(f'## Sheet: {sheet_name}')
-
-                # Find the actual data range
-                max_row = 0
-                max_col = 0
-                for row in sheet.iter_rows():
-                    for cell in row:
-                        if cell.value is not None:
-                            max_row = max(max_row, cell.row)
-                            max_col = max(max_col, cell.column)
-
-                if max_row > 0 and max_col > 0:
-                    # Extract data as table
-                    table_data = []
-                    for row in sheet.iter_rows(min_row=1, max_row=max_row, min_col=1, max_col=max_col):
-                        row_data = []
-                        for cell in row:
-                            value = cell.value
-                            if value is None:
-                                row_data.append('')
-                            else:
-                                row_data.append(str(value).strip())
-                        table_data.append(row_data)
-
-                    # Convert to markdown table
-                    if table_data:
-                        md_table = self.__table_to_markdown(table_data)
-                        if md_table:
-                            content.append(md_table)
-                else:
-                    content.append('(Empty sheet)')
-
-            return '\n\n'.join(content)
+            workbook = openpyxl.load_workbook(file.file, read_only=True)
+            try:
+                return '\n\n'.join(self.iter_xlsx_blocks(workbook))
+            finally:
+                workbook.close()
         except Exception as e:
             raise ValueError(f'Failed to extract text from XLSX file: {str(e)}')
+
+    def iter_xlsx_blocks(self, workbook) -> Iterator[str]:
+        """Stream every sheet as Markdown in a single pass over its rows.
+
+        A sheet that fits in one block is emitted as a single table. Larger sheets are
+        split into tables of at most ``XLSX_BLOCK_ROWS`` rows / ``XLSX_BLOCK_CHARS``
+        characters, each under its own heading and repeating the header row, so the
+        chunker can take them one section at a time.
+        """
+        for sheet in workbook.worksheets:
+            # Add sheet name as header
+            yield f'## Sheet: {sheet.title}'
+
+            rows = sheet.iter_rows(values_only=True)
+            header = self.__xlsx_row(next(rows, ()))
+            width = len(header)
+
+            block: List[List[str]] = []
+            block_chars = 0
+            block_start = 2
+            empty_rows = 0
+            split = False
+
+            for row_number, values in enumerate(rows, start=2):
+                row = self.__xlsx_row(values)
+                if not row:
+                    # Only keep empty rows that sit between data rows
+                    empty_rows += 1
+                    continue
+
+                if block and (len(block) + empty_rows >= XLSX_BLOCK_ROWS or block_chars >= XLSX_BLOCK_CHARS):
+                    yield f'### Sheet: {sheet.title} (rows {block_start}-{row_number - empty_rows - 1})'
+                    yield self.__xlsx_table(header, block, width)
+                    split = True
+                    # Empty rows at a block boundary are dropped
+                    block, block_chars, block_start, empty_rows = [], 0, row_number, 0
+
+                block.extend([] for _ in range(empty_rows))
+                empty_rows = 0
+                block.append(row)
+                block_chars += sum(len(cell) for cell in row)
+                width = max(width, len(row))
+
+            if not width:
+                yield '(Empty sheet)'
+            elif split:
+                yield f'### Sheet: {sheet.title} (rows {block_start}-{block_start + len(block) - 1})'
+                yield self.__xlsx_table(header, block, width)
+            else:
+                yield self.__xlsx_table(header, block, width)
+
+    def __xlsx_row(self, values) -> List[str]:
+        """Convert a row of cell values to strings, dropping trailing empty cells."""
+        row = ['' if value is None else str(value).strip() for value in values]
+        while row and not row[-1]:
+            row.pop()
+        return row
+
+    def __xlsx_table(self, header: List[str], rows: List[List[str]], width: int) -> str:
+        return self.__table_to_markdown([header + [''] * (width - len(header))] + rows)
+
+
+def _extract_page_range(
+    extractor: ExtractorService, file_byte: bytes, start: int, end: int,
+) -> List[Tuple[int, str, Optional[RasterRequest]]]:
+    """Module-level entry point so page ranges can also be dispatched to a process pool."""
+    return extractor.extract_pdf_page_range(file_byte, start, end)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from typing import Dict
+from typing import List
+from typing import Set
+
+# Leading "A.", "B1." style numbering, ignored when matching headers loosely
+NUMBERING_PREFIX_PATTERN = re.compile(r'^[A-Z]\d*\.?\s*')
+FUZZY_MIN_WORD_RATIO = 0.7
+
+
+def _clean_words(text: str) -> List[str]:
+    return NUMBERING_PREFIX_PATTERN.sub('', text.strip()).strip().lower().split()
+
+
+class HeaderLineIndex:
+    """Finds the document line a detected header came from, built once per document.
+
+    Exact matches are looked up by stripped line text; otherwise the line sharing at
+    least 70% of the header's words (numbering prefix ignored) is found through an
+    inverted word index. Every matched line is consumed, so a header text that occurs
+    several times is resolved to its occurrences in document order; use
+    :meth:`find_all` so exact matches are taken before fuzzy ones.
+    """
+
+    def __init__(self, text_lines: List[str]):
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._used: Set[int] = set()
+
+        for line_id, line in enumerate(text_lines):
+            stripped = line.strip()
+            if not stripped:
+                continue
+            self._exact[stripped].append(line_id)
+            for word in set(_clean_words(stripped)):
+                self._postings[word].append(line_id)
+
+    def find(self, header_text: str) -> int:
+        """Return the first unused line matching header_text and mark it used, or -1."""
+        line_id = self._find_exact(header_text)
+        return line_id if line_id >= 0 else self._find_fuzzy(header_text)
+
+    def find_all(self, header_texts: List[str]) -> List[int]:
+        """Resolve several headers at once, exact matches first.
+
+        Lines are only consumed by fuzzy matches once every header with an exact match
+        has taken its line, so a loose match never takes a line another header names
+        exactly.
+        """
+        found = [self._find_exact(header_text) for header_text in header_texts]
+        return [
+            line_id if line_id >= 0 else self._find_fuzzy(header_text)
+            for header_text, line_id in zip(header_texts, found)
+        ]
+
+    def _find_exact(self, header_text: str) -> int:
+        for line_id in self._exact.get(header_text.strip(), ()):
+            if line_id not in self._used:
+                return self._take(line_id)
+        return -1
+
+    def _find_fuzzy(self, header_text: str) -> int:
+        header_words = _clean_words(header_text)
+        if not header_words:
+            return -1
+
+        # Count the distinct header words each line shares with the header
+        shared: Dict[int, int] = defaultdict(int)
+        for word in set(header_words):
+            for line_id in self._postings.get(word, ()):
+                shared[line_id] += 1
+
+        required = len(header_words) * FUZZY_MIN_WORD_RATIO
+        matches = [
+            line_id for line_id, count in shared.items()
+            if count >= required and line_id not in self._used
+        ]
+        return self._take(min(matches)) if matches else -1
+
+    def _take(self, line_id: int) -> int:
+        self._used.add(line_id)
+        return line_id
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from dataclasses import field
+from itertools import accumulate
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .config import HEADER_RULES_MIN_HEADERS
+from .prompt_builder import CANDIDATE_MAX_WORDS
+
+ROMAN_VALUES = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+
+# Sub-section ordinals have no leading zero and at most two digits, and the
+# numbering must be followed by a word, so amounts like "1.500.000 đồng" never match
+SUB_ORDINAL = r'([1-9]\d?)'
+FOLLOWED_BY_WORD = r'\s+[^\W\d_]'
+
+# (family, depth) -> pattern capturing the ordinals of the numbering prefix
+NUMBERING_PATTERNS: List[Tuple[Tuple[str, int], re.Pattern]] = [
+    (('letter', 3), re.compile(rf'^([A-Z])\.{SUB_ORDINAL}\.{SUB_ORDINAL}\.?{FOLLOWED_BY_WORD}')),
+    (('letter', 2), re.compile(rf'^([A-Z])\.{SUB_ORDINAL}\.?{FOLLOWED_BY_WORD}')),
+    (('numeric', 3), re.compile(rf'^(\d+)\.{SUB_ORDINAL}\.{SUB_ORDINAL}\.?{FOLLOWED_BY_WORD}')),
+    (('numeric', 2), re.compile(rf'^(\d+)\.{SUB_ORDINAL}\.?{FOLLOWED_BY_WORD}')),
+    (('roman', 1), re.compile(rf'^([IVXLCDM]+)[.)]{FOLLOWED_BY_WORD}')),
+    (('letter', 1), re.compile(rf'^([A-Z])[.)]{FOLLOWED_BY_WORD}')),
+    (('numeric', 1), re.compile(rf'^(\d+)[.)]{FOLLOWED_BY_WORD}')),
+]
+
+# Outermost numbering first, e.g. "I." > "A." > "A.1." > "1." > "1.1."
+SCHEME_ORDER = [
+    ('roman', 1),
+    ('letter', 1), ('letter', 2), ('letter', 3),
+    ('numeric', 1), ('numeric', 2), ('numeric', 3),
+]
+
+MAX_LEVEL = 4
+TITLE_MIN_CHARS = 4
+# Text needed between a header and its next sibling for it to open a section
+SECTION_MIN_CHARS = 20
+
+
+def roman_to_int(numeral: str) -> int:
+    total = 0
+    for i, char in enumerate(numeral):
+        value = ROMAN_VALUES[char]
+        if i + 1 < len(numeral) and ROMAN_VALUES[numeral[i + 1]] > value:
+            total -= value
+        else:
+            total += value
+    return total
+
+
+@dataclass
+class HeaderMatch:
+    line_id: int
+    scheme: Tuple[str, int]
+    ordinals: Tuple[int, ...]
+    short: bool
+
+
+@dataclass
+class HeaderDetection:
+    """Header hierarchy found by the rules and how much the structure can be trusted."""
+    headers: Dict[str, List[int]] = field(default_factory=dict)
+    confidence: float = 0.0
+
+    def to_json(self) -> str:
+        """Same line-id JSON shape the windowed LLM detection produces."""
+        return json.dumps(self.headers)
+
+
+class HeaderRuleEngine:
+    """Deterministic header detection for documents with strict section numbering.
+
+    Numbered lines ("I.", "A.", "A.1.", "1.1.", ...) and short all-caps titles are
+    matched line by line, ranked outermost-first into h1-h4, and scored by how well
+    the numbering runs in sequence, how many of the matched lines look like titles
+    rather than list items or sentences, and how many of them open a section with
+    text before the next header of the same kind.
+    """
+
+    def __init__(self, min_headers: int = HEADER_RULES_MIN_HEADERS):
+        self.min_headers = min_headers
+
+    def detect(self, raw_text: str) -> HeaderDetection:
+        lines = [line.strip() for line in raw_text.split('\n')]
+        matches: List[HeaderMatch] = []
+        titles: List[int] = []
+        for line_id, line in enumerate(lines):
+            if not line or line.startswith(('#', '|')):
+                continue
+            match = self._match_numbering(line_id, line)
+            if match is not None:
+                matches.append(match)
+            elif self._is_title(line):
+                titles.append(line_id)
+
+        matches = self._resolve_roman(matches)
+        if len(matches) + len(titles) < self.min_headers or not matches:
+            return HeaderDetection()
+
+        schemes = [scheme for scheme in SCHEME_ORDER if any(m.scheme == scheme for m in matches)]
+        base_level = 2 if titles else 1
+        levels = {scheme: base_level + rank for rank, scheme in enumerate(schemes)}
+
+        headers: Dict[str, List[int]] = {}
+        if titles:
+            headers['h1'] = titles
+        for match in matches:
+            level = levels[match.scheme]
+            # Deeper numbering than h4 stays body text
+            if level <= MAX_LEVEL:
+                headers.setdefault(f'h{level}', []).append(match.line_id)
+
+        short_ratio = sum(m.short for m in matches) / len(matches)
+        confidence = (
+            self._continuity(matches, schemes) * short_ratio
+            * self._separation(lines, matches, titles)
+        )
+        return HeaderDetection(headers=headers, confidence=round(confidence, 3))
+
+    def _match_numbering(self, line_id: int, line: str) -> Optional[HeaderMatch]:
+        for scheme, pattern in NUMBERING_PATTERNS:
+            found = pattern.match(line)
+            if not found:
+                continue
+            groups = found.groups()
+            if scheme[0] == 'roman':
+                ordinals: Tuple[int, ...] = (roman_to_int(groups[0]),)
+            elif scheme[0] == 'letter':
+                ordinals = (ord(groups[0]) - ord('A') + 1, *(int(g) for g in groups[1:]))
+            else:
+                ordinals = tuple(int(g) for g in groups)
+            short = len(line.split()) <= CANDIDATE_MAX_WORDS and line[-1] not in '.;,'
+            return HeaderMatch(line_id, scheme, ordinals, short)
+        return None
+
+    def _is_title(self, line: str) -> bool:
+        return (
+            line.isupper() and len(line) >= TITLE_MIN_CHARS
+            and len(line.split()) <= CANDIDATE_MAX_WORDS
+        )
+
+    def _resolve_roman(self, matches: List[HeaderMatch]) -> List[HeaderMatch]:
+        """Read single-letter numerals like "C." or "I." as letters unless they continue a Roman run.
+
+        "C." after "A." and "B." is a letter and "II." after "I." is Roman. A single
+        letter that continues neither sequence is Roman only when it is "I.", which
+        opens a new run.
+        """
+        single_letters = {value: numeral for numeral, value in ROMAN_VALUES.items()}
+        last_roman = 0
+        last_letter = 0
+        resolved = []
+        for m in matches:
+            if m.scheme == ('roman', 1) and m.ordinals[0] in single_letters:
+                value = m.ordinals[0]
+                letter_ordinal = ord(single_letters[value]) - ord('A') + 1
+                if letter_ordinal == last_letter + 1 or value not in (1, last_roman + 1):
+                    m = HeaderMatch(m.line_id, ('letter', 1), (letter_ordinal,), m.short)
+
+            if m.scheme == ('roman', 1):
+                last_roman = m.ordinals[0]
+                # A new Roman section restarts its lettered subsections
+                last_letter = 0
+            elif m.scheme == ('letter', 1):
+                last_letter = m.ordinals[0]
+            resolved.append(m)
+        return resolved
+
+    def _continuity(self, matches: List[HeaderMatch], schemes: List[Tuple[str, int]]) -> float:
+        """Share of numbered headers that continue their sibling sequence (starting at 1 under a new parent)."""
+        rank = {scheme: i for i, scheme in enumerate(schemes)}
+        last_ordinal: Dict[Tuple[str, int], int] = {}
+        in_sequence = 0
+        for match in matches:
+            ordinal = match.ordinals[-1]
+            expected = last_ordinal.get(match.scheme, 0) + 1
+            if ordinal == expected:
+                in_sequence += 1
+            last_ordinal[match.scheme] = ordinal
+            # A new parent restarts the numbering of every nested scheme
+            for scheme in schemes:
+                if rank[scheme] > rank[match.scheme]:
+                    last_ordinal.pop(scheme, None)
+        return in_sequence / len(matches)
+
+    def _separation(self, lines: List[str], matches: List[HeaderMatch], titles: List[int]) -> float:
+        """Share of headers, numbered or title, with real text before their next sibling.
+
+        Numbered list items ("1. Passport", "2. Photo") and stacked all-caps lines such
+        as letterheads sit on adjacent lines; section headers are followed by a body or
+        by nested sections before the next header of the same kind.
+        """
+        siblings: Dict[Tuple[str, int], List[int]] = {('title', 0): titles}
+        for match in matches:
+            siblings.setdefault(match.scheme, []).append(match.line_id)
+
+        # chars_before[i] is the text length of lines[:i]
+        chars_before = [0, *accumulate(len(line) for line in lines)]
+        separated = 0
+        for line_ids in siblings.values():
+            for line_id, next_id in zip(line_ids, [*line_ids[1:], len(lines)]):
+                if chars_before[next_id] - chars_before[line_id + 1] >= SECTION_MIN_CHARS:
+                    separated += 1
+        return separated / (len(matches) + len(titles))
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+from typing import List
+from typing import Tuple
 
 import boto3
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 from shared.logging.logger import get_logger
 
+from .config import HEADER_WINDOW_MAX_TOKENS
+from .prompt_builder import build_header_candidates_prompt
 from .prompt_builder import build_markdown_prompt
 
 # Initialize logger
@@ -41,7 +46,24 @@ class NovaMarkdownGenerator:
     async def generate(self, raw_text: str) -> str:
         prompt = build_markdown_prompt(raw_text)
         logger.info('Generating markdown', model_id=self.model_id, input_length=len(raw_text))
+        return await self._invoke(prompt, max_new_tokens=8192)
 
+    async def generate_line_headers(
+        self,
+        candidates: List[Tuple[int, str]],
+        max_new_tokens: int = HEADER_WINDOW_MAX_TOKENS,
+    ) -> str:
+        """Classify candidate header lines, answering with line ids per header level."""
+        prompt = build_header_candidates_prompt(candidates)
+        logger.info(
+            'Generating line headers',
+            model_id=self.model_id,
+            candidates=len(candidates),
+            first_line=candidates[0][0] if candidates else None,
+        )
+        return await self._invoke(prompt, max_new_tokens=max_new_tokens)
+
+    async def _invoke(self, prompt: str, max_new_tokens: int) -> str:
         body = {
             'messages': [
                 {
@@ -54,13 +76,15 @@ class NovaMarkdownGenerator:
                 },
             ],
             'inferenceConfig': {
-                'max_new_tokens': 8192,
+                'max_new_tokens': max_new_tokens,
                 'temperature': 0.4,
             },
         }
 
         try:
-            response = self.client.invoke_model(
+            # The boto3 client is blocking, keep it off the event loop so windows run concurrently
+            response = await asyncio.to_thread(
+                self.client.invoke_model,
                 modelId=self.model_id,
                 body=json.dumps(body),
                 contentType='application/json',
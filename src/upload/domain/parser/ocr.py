@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+import pytesseract
+from PIL import Image
+from shared.logging.logger import get_logger
+
+from .config import OCR_BATCH_SIZE
+from .config import OCR_FALLBACK_LANG
+from .config import OCR_LANG
+from .config import OCR_MAX_WORKERS
+from .config import OCR_TESSDATA_PATH
+
+try:
+    # Imported at module load: the bindings install signal handlers, which only works on the main thread
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+logger = get_logger(__name__)
+
+# Tesseract page segmentation modes
+PSM_SINGLE_BLOCK = 6
+PSM_SPARSE_TEXT = 11
+
+# One recognizer per (thread, language pair), reused for every region the thread sees
+_local = threading.local()
+
+
+@dataclass
+class OcrResult:
+    """Recognized text of a single region and the time spent on it."""
+    text: str
+    elapsed: float
+
+
+@dataclass
+class OcrWords:
+    """Word-level boxes of a region, as columns parsed from Tesseract TSV output."""
+    texts: List[str]
+    left: np.ndarray
+    top: np.ndarray
+    width: np.ndarray
+    height: np.ndarray
+    elapsed: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+def parse_tsv(tsv: str) -> OcrWords:
+    """Parse Tesseract TSV output, keeping only non-empty word rows (level 5)."""
+    texts = []
+    boxes = []
+    for line in tsv.splitlines():
+        fields = line.split('\t')
+        # level page block par line word left top width height conf text
+        if len(fields) < 12 or fields[0] != '5':
+            continue
+        text = fields[11].strip()
+        if not text:
+            continue
+        texts.append(text)
+        boxes.append([int(value) for value in fields[6:10]])
+
+    columns = np.array(boxes, dtype=np.int32).reshape(-1, 4)
+    return OcrWords(
+        texts=texts,
+        left=columns[:, 0],
+        top=columns[:, 1],
+        width=columns[:, 2],
+        height=columns[:, 3],
+    )
+
+
+class TesseractRecognizer:
+    """Long-lived Tesseract recognizer.
+
+    Uses the tesserocr C-API bindings when available so the traineddata is loaded
+    once per worker, otherwise falls back to the pytesseract CLI wrapper.
+    """
+
+    def __init__(self, lang: str = OCR_LANG, fallback_lang: Optional[str] = OCR_FALLBACK_LANG):
+        self.lang = lang
+        self.fallback_lang = fallback_lang
+        self._apis: Dict[Tuple[str, int], object] = {}
+        self._tesserocr = tesserocr
+
+    def _get_api(self, lang: str, psm: int):
+        key = (lang, psm)
+        if key not in self._apis:
+            kwargs = {'path': OCR_TESSDATA_PATH} if OCR_TESSDATA_PATH else {}
+            self._apis[key] = self._tesserocr.PyTessBaseAPI(
+                lang=lang,
+                psm=psm,
+                oem=self._tesserocr.OEM.DEFAULT,
+                **kwargs,
+            )
+        return self._apis[key]
+
+    def _read(self, image: np.ndarray, lang: str) -> str:
+        if self._tesserocr is None:
+            return pytesseract.image_to_string(image, config=f'--oem 3 --psm {PSM_SINGLE_BLOCK} -l {lang}')
+
+        api = self._get_api(lang, PSM_SINGLE_BLOCK)
+        api.SetImage(Image.fromarray(image))
+        return api.GetUTF8Text()
+
+    def _read_tsv(self, image: np.ndarray, lang: str) -> str:
+        if self._tesserocr is None:
+            return pytesseract.image_to_data(image, config=f'--oem 3 --psm {PSM_SPARSE_TEXT} -l {lang}')
+
+        api = self._get_api(lang, PSM_SPARSE_TEXT)
+        api.SetImage(Image.fromarray(image))
+        return api.GetTSVText(0)
+
+    def recognize(self, image: np.ndarray) -> str:
+        text = self._read(image, self.lang)
+        # If Vietnamese fails, try English only
+        if not text and self.fallback_lang:
+            text = self._read(image, self.fallback_lang)
+        return text
+
+    def recognize_words(self, image: np.ndarray) -> OcrWords:
+        """Recognize a whole region once and return its word boxes."""
+        words = parse_tsv(self._read_tsv(image, self.lang))
+        if not len(words) and self.fallback_lang:
+            words = parse_tsv(self._read_tsv(image, self.fallback_lang))
+        return words
+
+    def close(self) -> None:
+        for api in self._apis.values():
+            api.End()
+        self._apis.clear()
+
+
+def _get_recognizer(lang: str, fallback_lang: Optional[str]) -> TesseractRecognizer:
+    recognizers = getattr(_local, 'recognizers', None)
+    if recognizers is None:
+        recognizers = _local.recognizers = {}
+    key = (lang, fallback_lang)
+    if key not in recognizers:
+        recognizers[key] = TesseractRecognizer(lang, fallback_lang)
+    return recognizers[key]
+
+
+def _init_worker(lang: str, fallback_lang: Optional[str]) -> None:
+    """Warm up the recognizer as soon as the worker process starts."""
+    _get_recognizer(lang, fallback_lang)
+
+
+def _recognize_region_words(images: List[np.ndarray], lang: str, fallback_lang: Optional[str]) -> List[OcrWords]:
+    recognizer = _get_recognizer(lang, fallback_lang)
+    results = []
+    for image in images:
+        start_time = time.perf_counter()
+        words = recognizer.recognize_words(image)
+        words.elapsed = time.perf_counter() - start_time
+        results.append(words)
+    return results
+
+
+def _recognize_regions(images: List[np.ndarray], lang: str, fallback_lang: Optional[str]) -> List[OcrResult]:
+    recognizer = _get_recognizer(lang, fallback_lang)
+    results = []
+    for image in images:
+        start_time = time.perf_counter()
+        text = recognizer.recognize(image)
+        results.append(OcrResult(text=text, elapsed=time.perf_counter() - start_time))
+    return results
+
+
+class OcrEngine:
+    """Pool of persistent Tesseract workers that recognizes batches of image regions.
+
+    With ``max_workers=0`` regions are recognized inline in the calling thread, which
+    is also what happens when the engine is shipped to another process (e.g. a PDF
+    page-range worker) so pools are never nested.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = OCR_MAX_WORKERS,
+        batch_size: int = OCR_BATCH_SIZE,
+        lang: str = OCR_LANG,
+        fallback_lang: Optional[str] = OCR_FALLBACK_LANG,
+    ):
+        self.max_workers = max_workers
+        self.batch_size = max(1, batch_size)
+        self.lang = lang
+        self.fallback_lang = fallback_lang
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inline = max_workers <= 0
+        self._lock = threading.Lock()
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_inline'] = True
+        state['_timings'] = {}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self._inline:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.lang, self.fallback_lang),
+                )
+            return self._executor
+
+    def _submit_batch(self, images: List[np.ndarray], func=_recognize_regions) -> Future:
+        executor = self._get_executor()
+        if executor is not None:
+            return executor.submit(func, images, self.lang, self.fallback_lang)
+
+        future: Future = Future()
+        try:
+            future.set_result(func(images, self.lang, self.fallback_lang))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _map_batches(self, images: List[np.ndarray], func=_recognize_regions) -> list:
+        # Keep batches small enough that every worker gets a share of the regions
+        size = max(1, min(self.batch_size, math.ceil(len(images) / max(1, self.max_workers))))
+        futures = [
+            self._submit_batch(images[i:i + size], func)
+            for i in range(0, len(images), size)
+        ]
+        results: list = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def _record(self, kind: str, results: List) -> None:
+        if not results:
+            return
+        elapsed = [result.elapsed for result in results]
+        with self._lock:
+            timing = self._timings.setdefault(kind, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            timing['count'] += len(elapsed)
+            timing['total_seconds'] += sum(elapsed)
+            timing['max_seconds'] = max(timing['max_seconds'], max(elapsed))
+        logger.info(
+            'OCR batch completed',
+            kind=kind,
+            regions=len(results),
+            total_seconds=round(sum(elapsed), 3),
+            mean_seconds=round(sum(elapsed) / len(elapsed), 3),
+        )
+
+    def submit(self, image: np.ndarray, kind: str = 'page') -> Future:
+        """Start recognizing a single region in the background, resolving to its text."""
+        result_future: Future = Future()
+
+        def _done(batch_future: Future) -> None:
+            try:
+                results = batch_future.result()
+                self._record(kind, results)
+                result_future.set_result(results[0].text)
+            except Exception as e:
+                result_future.set_exception(e)
+
+        self._submit_batch([image]).add_done_callback(_done)
+        return result_future
+
+    def recognize(self, image: np.ndarray, kind: str = 'page') -> str:
+        """Recognize a single region."""
+        return self.submit(image, kind).result()
+
+    def recognize_batch(self, images: List[np.ndarray], kind: str = 'cell') -> List[str]:
+        """Recognize many regions, spread across the worker pool, preserving order."""
+        results: List[OcrResult] = self._map_batches(images)
+        self._record(kind, results)
+        return [result.text for result in results]
+
+    def recognize_words_batch(self, images: List[np.ndarray], kind: str = 'table') -> List[OcrWords]:
+        """Recognize each region in a single pass, returning word boxes instead of plain text."""
+        results: List[OcrWords] = self._map_batches(images, _recognize_region_words)
+        self._record(kind, results)
+        return results
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per region kind: number of regions, total and slowest recognition time."""
+        with self._lock:
+            return {kind: dict(timing) for kind, timing in self._timings.items()}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -1,41 +1,189 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import re
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
 
 from dotenv import load_dotenv
 from shared.logging.logger import get_logger
 
+from .config import HEADER_DETECTION_MODE
+from .config import HEADER_FULL_MAX_CHARS
+from .config import HEADER_RULES_ENABLED
+from .config import HEADER_RULES_MIN_CONFIDENCE
+from .config import HEADER_WINDOW_CONCURRENCY
+from .config import HEADER_WINDOW_LINES
+from .config import HEADER_WINDOW_OVERLAP
+from .header_index import HeaderLineIndex
+from .header_rules import HeaderRuleEngine
 from .markdown_generator import NovaMarkdownGenerator
+from .prompt_builder import select_candidate_lines
 
 logger = get_logger(__name__)
 load_dotenv()
 
 
+HEADER_LEVELS = ['h1', 'h2', 'h3', 'h4']
+
+
 class Parser:
-    def __init__(self, region_name=None, model_id=None):
+    def __init__(
+        self,
+        region_name=None,
+        model_id=None,
+        header_mode: str = HEADER_DETECTION_MODE,
+        window_lines: int = HEADER_WINDOW_LINES,
+        window_overlap: int = HEADER_WINDOW_OVERLAP,
+        window_concurrency: int = HEADER_WINDOW_CONCURRENCY,
+        rules_enabled: bool = HEADER_RULES_ENABLED,
+        rules_min_confidence: float = HEADER_RULES_MIN_CONFIDENCE,
+    ):
+        if header_mode not in ('full', 'windowed', 'auto'):
+            raise ValueError(f'Unsupported header detection mode: {header_mode}')
+        if window_overlap >= window_lines:
+            raise ValueError('window_overlap must be smaller than window_lines')
+
         self.generator = NovaMarkdownGenerator(
             region_name=region_name, model_id=model_id,
         )
+        self.header_mode = header_mode
+        self.window_lines = max(1, window_lines)
+        self.window_overlap = max(0, window_overlap)
+        self.window_concurrency = max(1, window_concurrency)
+        self.rule_engine = HeaderRuleEngine() if rules_enabled else None
+        self.rules_min_confidence = rules_min_confidence
 
     async def parse(self, raw_text: str) -> str:
         logger.info('Starting document parsing', input_length=len(raw_text))
 
+        detection = self.rule_engine.detect(raw_text) if self.rule_engine else None
+
+        if detection is not None and detection.confidence >= self.rules_min_confidence:
+            # Strictly numbered document, no need to ask the LLM
+            logger.info(
+                'Headers detected by rules',
+                confidence=detection.confidence,
+                headers={level: len(ids) for level, ids in detection.headers.items()},
+            )
+            json_output = detection.to_json()
         # Get JSON structure from NovaMarkdownGenerator
-        json_output = await self.generator.generate(raw_text)
+        elif self.header_mode == 'windowed' or (
+            self.header_mode == 'auto' and len(raw_text) > HEADER_FULL_MAX_CHARS
+        ):
+            json_output = await self._detect_headers_windowed(raw_text)
+        else:
+            json_output = await self.generator.generate(raw_text)
 
-        logger.info(
-            'Received JSON output from generator', output_length=len(json_output),
-        )
+        if json_output is None:
+            # Same fallback as an unparsable full-mode answer
+            markdown_content = self._format_as_basic_markdown(raw_text)
+        else:
+            logger.info(
+                'Received JSON output from generator', output_length=len(json_output),
+            )
 
-        # Parse the JSON output and merge with raw text
-        markdown_content = self._merge_json_with_raw_text(json_output, raw_text)
+            # Parse the JSON output and merge with raw text
+            markdown_content = self._merge_json_with_raw_text(json_output, raw_text)
 
         logger.info(
             'Completed document parsing', output_length=len(markdown_content),
         )
         return markdown_content
 
+    def _split_windows(
+        self, candidates: List[Tuple[int, str]],
+    ) -> List[Tuple[List[Tuple[int, str]], int, int]]:
+        """Split candidates into overlapping windows.
+
+        Returns (window, core_start, core_end) where the core is the half-open range of
+        line ids the window is authoritative for; cores of consecutive windows meet in
+        the middle of their overlap so every line is decided by exactly one window.
+        """
+        step = self.window_lines - self.window_overlap
+        starts = list(range(0, max(1, len(candidates) - self.window_overlap), step))
+        half_overlap = self.window_overlap // 2
+
+        windows = []
+        for i, start in enumerate(starts):
+            window = candidates[start:start + self.window_lines]
+            core_start = window[0][0] if i == 0 else candidates[start + half_overlap][0]
+            if i + 1 < len(starts):
+                core_end = candidates[starts[i + 1] + half_overlap][0]
+            else:
+                core_end = window[-1][0] + 1
+            windows.append((window, core_start, core_end))
+        return windows
+
+    async def _detect_headers_windowed(self, raw_text: str) -> Optional[str]:
+        """Ask the LLM about candidate header lines only, window by window.
+
+        Returns the same JSON shape as the full mode, with line ids instead of header text,
+        or None when no window answered with parsable JSON.
+        """
+        candidates = select_candidate_lines(raw_text)
+        if not candidates:
+            logger.info('No header candidates found')
+            return '{}'
+
+        windows = self._split_windows(candidates)
+        logger.info(
+            'Detecting headers from candidate lines',
+            candidates=len(candidates),
+            windows=len(windows),
+        )
+
+        semaphore = asyncio.Semaphore(self.window_concurrency)
+
+        async def _run(window: List[Tuple[int, str]]) -> str:
+            async with semaphore:
+                return await self.generator.generate_line_headers(window)
+
+        outputs = await asyncio.gather(*(_run(window) for window, _, _ in windows))
+
+        candidate_ids = {line_id for line_id, _ in candidates}
+        assigned: Dict[int, str] = {}
+        parsed_windows = 0
+        for (_, core_start, core_end), output in zip(windows, outputs):
+            window_headers = self._parse_window_output(output)
+            if window_headers is None:
+                continue
+            parsed_windows += 1
+            for level in HEADER_LEVELS:
+                for line_id in window_headers.get(level, []):
+                    # Only trust ids the window owns; the first level given to a line wins
+                    if (
+                        line_id in candidate_ids and core_start <= line_id < core_end
+                        and line_id not in assigned
+                    ):
+                        assigned[line_id] = level
+
+        if not parsed_windows:
+            logger.warning('No header window output could be parsed', windows=len(windows))
+            return None
+
+        headers: Dict[str, List[int]] = {}
+        for line_id in sorted(assigned):
+            headers.setdefault(assigned[line_id], []).append(line_id)
+        return json.dumps(headers)
+
+    def _parse_window_output(self, output: str) -> Optional[Dict[str, List[int]]]:
+        json_match = re.search(r'\{.*\}', output, re.DOTALL)
+        try:
+            if not json_match:
+                raise ValueError('no JSON object in output')
+            raw_headers = json.loads(json_match.group())
+            return {
+                level: [int(line_id) for line_id in raw_headers.get(level, [])]
+                for level in HEADER_LEVELS
+            }
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning('Skipping unparsable header window output', error=str(e))
+            return None
+
     def _merge_json_with_raw_text(self, json_output: str, raw_text: str) -> str:
         """
         Merge the JSON header structure with raw text to create structured markdown.
@@ -58,21 +206,28 @@ class Parser:
 
             # Create a copy of text lines to modify
             text_lines = raw_text.split('\n')
+            line_index = HeaderLineIndex(text_lines)
 
             # Replace original header lines with formatted markdown headers
-            for level in ['h1', 'h2', 'h3', 'h4']:
+            text_headers: List[Tuple[str, str]] = []
+            for level in HEADER_LEVELS:
                 if level in headers_json:
                     markdown_prefix = '#' * int(level[1])  # h1 -> #, h2 -> ##, etc.
 
                     for header_text in headers_json[level]:
-                        # Find and replace the matching text line
-                        header_found_idx = self._find_header_line_index(
-                            header_text, text_lines,
-                        )
+                        # Windowed detection answers with line ids instead of header text
+                        if isinstance(header_text, int):
+                            if 0 <= header_text < len(text_lines) and text_lines[header_text].strip():
+                                text_lines[header_text] = f'{markdown_prefix} {text_lines[header_text].strip()}'
+                            continue
+                        text_headers.append((markdown_prefix, header_text))
 
-                        if header_found_idx >= 0:
-                            # Replace the original line with formatted markdown header
-                            text_lines[header_found_idx] = f'{markdown_prefix} {header_text}'
+            # Find the matching text lines, exact matches before fuzzy ones
+            found_ids = line_index.find_all([header_text for _, header_text in text_headers])
+            for (markdown_prefix, header_text), header_found_idx in zip(text_headers, found_ids):
+                if header_found_idx >= 0:
+                    # Replace the original line with formatted markdown header
+                    text_lines[header_found_idx] = f'{markdown_prefix} {header_text}'
 
             # Format content lines (key-value pairs, etc.)
             formatted_lines = []
@@ -98,33 +253,6 @@ class Parser:
             logger.error('Error merging JSON with raw text', error=str(e))
             return self._format_as_basic_markdown(raw_text)
 
-    def _find_header_line_index(self, header_text: str, text_lines: list) -> int:
-        """
-        Find the index of the header line in the text that matches the header_text.
-        """
-        # First try exact match
-        for i, line in enumerate(text_lines):
-            if line.strip() == header_text.strip():
-                return i
-
-        # Then try partial match by removing numbering prefixes
-        header_clean = re.sub(r'^[A-Z]\d*\.?\s*', '', header_text).strip().lower()
-
-        for i, line in enumerate(text_lines):
-            line_clean = re.sub(
-                r'^[A-Z]\d*\.?\s*', '', line.strip(),
-            ).strip().lower()
-            # Check if the core text matches (at least 70% of words)
-            header_words = header_clean.split()
-            line_words = line_clean.split()
-
-            if header_words and line_words:
-                common_words = set(header_words) & set(line_words)
-                if len(common_words) >= len(header_words) * 0.7:
-                    return i
-
-        return -1
-
     def _format_as_basic_markdown(self, raw_text: str) -> str:
         """
         Basic markdown formatting when JSON parsing fails.
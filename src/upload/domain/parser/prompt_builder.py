@@ -1,5 +1,117 @@
 from __future__ import annotations
 
+import re
+from typing import List
+from typing import Tuple
+
+# Numbered section markers: "A.", "A.1.", "II.", "1.2)", "Chương 1", "Điều 5", "Section 3"...
+NUMBERED_HEADER_PATTERN = re.compile(
+    r'^(?:(?:[A-Z]|[IVXLCDM]+|\d+)(?:\.\d+)*[.)]\s|'
+    r'(?:chương|điều|mục|phần|phụ lục|chapter|section|article|part|appendix)\s+[\w.]+)',
+    re.IGNORECASE,
+)
+CANDIDATE_MAX_CHARS = 150
+CANDIDATE_MAX_WORDS = 20
+
+
+def is_header_candidate(line: str) -> bool:
+    """Cheap pre-filter for lines that could be section headers."""
+    if not line or len(line) > CANDIDATE_MAX_CHARS or line.startswith(('#', '|')):
+        return False
+
+    words = line.split()
+    if len(words) > CANDIDATE_MAX_WORDS:
+        return False
+    if NUMBERED_HEADER_PATTERN.match(line):
+        return True
+    if line.isupper() and len(line) >= 4:
+        return True
+    # Short title-like lines without sentence punctuation
+    return len(words) <= 10 and line[0].isupper() and line[-1] not in '.,;:'
+
+
+def select_candidate_lines(raw_text: str) -> List[Tuple[int, str]]:
+    """Return (line id, text) of every line that could be a header, line ids index raw_text lines."""
+    candidates = []
+    for line_id, line in enumerate(raw_text.split('\n')):
+        line = line.strip()
+        if is_header_candidate(line):
+            candidates.append((line_id, line))
+    return candidates
+
+
+def build_header_candidates_prompt(candidates: List[Tuple[int, str]]) -> str:
+    lines = '\n'.join(f'[{line_id}] {text}' for line_id, text in candidates)
+    has_vietnamese = any(ord(char) > 127 for char in lines if char.isalpha())
+    if has_vietnamese:
+        return f"""
+        <ROLE>
+        Bạn là chuyên gia phân tích cấu trúc tài liệu. Bạn có khả năng xác định tiêu đề các mục (header) dựa trên cách diễn đạt, kiểu đánh số, hoặc các dấu hiệu định dạng.
+        </ROLE>
+
+        <TASK>
+        Dưới đây là các dòng có khả năng là tiêu đề, được lọc ra từ một tài liệu theo đúng thứ tự xuất hiện. Mỗi dòng bắt đầu bằng mã dòng trong ngoặc vuông, ví dụ "[12]".
+        Hãy xác định dòng nào thực sự là tiêu đề và cấp độ của nó (h1, h2, h3, h4). Bỏ qua các dòng không phải tiêu đề.
+        </TASK>
+
+        <GUIDELINES>
+        - **h1**: Tiêu đề chính của tài liệu hoặc các phần cấp cao nhất
+        - **h2**: Các mục lớn nằm dưới h1
+        - **h3**: Các mục con nằm dưới h2
+        - **h4**: Các mục chi tiết hơn nằm dưới h3
+        - Các tiêu đề đánh số như “A.”, “B.”, “C.” thường là cấp h2; còn “A.1.”, “A.2.” là h3; và “A.1.1.” sẽ là h4
+        - Nếu trong tài liệu không có cấp độ nào đó thì bỏ qua khóa (key) đó trong JSON
+        </GUIDELINES>
+
+        <OUTPUT FORMAT>
+        Trả về một đối tượng JSON, khóa là "h1", "h2", "h3", "h4" và giá trị là mảng các **mã dòng** (số nguyên), không chép lại nội dung dòng.
+        Ví dụ:
+                {{
+                "h1": [0],
+                "h2": [3, 27],
+                "h3": [5, 9, 30]
+                }}
+        </OUTPUT_FORMAT>
+
+        <CONTENTS>
+        {lines}
+        </CONTENTS>
+                """
+
+    return f"""
+        <ROLE>
+        You are an expert in document structure analysis. You are highly capable of identifying section titles based on their wording, numbering style.
+        </ROLE>
+
+        <TASK>
+        Below are the lines of a document that may be headers, in document order. Each line starts with its line id in square brackets, e.g. "[12]".
+        Decide which lines are real headers and their level (h1, h2, h3, h4). Skip lines that are not headers.
+        </TASK>
+
+        <GUIDELINES>
+        - **h1**: Main document title or primary sections (top level)
+        - **h2**: Major subsections under h1
+        - **h3**: Sub-subsections under h2
+        - **h4**: Detailed subsections under h3
+        - Headers with numbering like "A.", "B.", "C." are typically h2 level, while "A.1.", "A.2." are h3 level, and "A.1.1." would be h4 level.
+        - If a header level doesn't exist in the document, omit that key from the JSON
+        </GUIDELINES>
+
+        <OUTPUT FORMAT>
+        Output a JSON object whose keys are "h1", "h2", "h3", "h4" and whose values are arrays of **line ids** (integers), do not copy the line text.
+        Example:
+        {{
+        "h1": [0],
+        "h2": [3, 27],
+        "h3": [5, 9, 30]
+        }}
+        </OUTPUT FORMAT>
+
+        <CONTENTS>
+        {lines}
+        </CONTENTS>
+            """
+
 
 def build_markdown_prompt(raw_text: str) -> str:
     has_vietnamese = any(ord(char) > 127 for char in raw_text if char.isalpha())
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import math
+import os
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import cv2
+import numpy as np
+from pdf2image import convert_from_bytes
+
+from .config import RASTER_BATCH_PAGES
+from .config import RASTER_DPI
+from .config import RASTER_GRAYSCALE
+from .config import RASTER_MAX_PIXELS
+from .config import RASTER_MIN_DPI
+
+
+@dataclass
+class RasterRequest:
+    """A PDF page that needs OCR and the resolution it should be rendered at."""
+    page_index: int
+    dpi: int
+
+
+def choose_page_dpi(page) -> int:
+    """Pick a render DPI for a pdfplumber page from its size and embedded scans.
+
+    Scanned pages are rendered no finer than the resolution of the scan itself, and
+    oversized pages are scaled down so a single frame stays within the pixel budget.
+    Only pages with an empty text layer are rasterized, so there is no text density
+    to probe; the embedded scan resolution stands in for it.
+    """
+    dpi = RASTER_DPI
+
+    # Rendering above the native resolution of the embedded scan adds pixels, not detail
+    native_dpis = [
+        image['srcsize'][0] * 72 / float(image['width'])
+        for image in page.images
+        if image.get('srcsize') and image.get('width')
+    ]
+    if native_dpis:
+        dpi = min(dpi, max(RASTER_MIN_DPI, int(max(native_dpis))))
+
+    width_in, height_in = float(page.width) / 72, float(page.height) / 72
+    if width_in > 0 and height_in > 0:
+        dpi = min(dpi, int(math.sqrt(RASTER_MAX_PIXELS / (width_in * height_in))))
+
+    return max(1, dpi)
+
+
+class PageRasterizer:
+    """Renders the PDF pages that need OCR in a few batched pdftoppm passes.
+
+    Consecutive pages sharing a DPI are rendered together, frames go to a temporary
+    directory instead of memory, and the next batch is rendered while the caller
+    works on the current one.
+    """
+
+    def __init__(
+        self,
+        batch_pages: int = RASTER_BATCH_PAGES,
+        grayscale: bool = RASTER_GRAYSCALE,
+    ):
+        self.batch_pages = max(1, batch_pages)
+        self.grayscale = grayscale
+
+    def __group_runs(self, requests: List[RasterRequest]) -> List[Tuple[int, int, int]]:
+        """Group requests into (first_page, last_page, dpi) runs of consecutive pages."""
+        runs: List[Tuple[int, int, int]] = []
+        for request in sorted(requests, key=lambda r: r.page_index):
+            page_number = request.page_index + 1
+            if runs:
+                first, last, dpi = runs[-1]
+                if dpi == request.dpi and last + 1 == page_number and page_number - first < self.batch_pages:
+                    runs[-1] = (first, page_number, dpi)
+                    continue
+            runs.append((page_number, page_number, request.dpi))
+        return runs
+
+    def __render_run(self, file_byte: bytes, run: Tuple[int, int, int], output_folder: str) -> List[str]:
+        first, last, dpi = run
+        return convert_from_bytes(
+            pdf_file=file_byte,
+            dpi=dpi,
+            first_page=first,
+            last_page=last,
+            output_folder=output_folder,
+            output_file=f'page_{first}',
+            grayscale=self.grayscale,
+            paths_only=True,
+        )
+
+    def iter_pages(self, file_byte: bytes, requests: List[RasterRequest]) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (page_index, image) for every request, in page order, as pages are rendered."""
+        runs = self.__group_runs(requests)
+        if not runs:
+            return
+
+        read_flag = cv2.IMREAD_GRAYSCALE if self.grayscale else cv2.IMREAD_COLOR
+        with tempfile.TemporaryDirectory(prefix='raster_') as output_folder, ThreadPoolExecutor(max_workers=1) as renderer:
+            pending: Optional[Future] = renderer.submit(self.__render_run, file_byte, runs[0], output_folder)
+            for run_idx, run in enumerate(runs):
+                current = pending
+                # Render ahead while the caller consumes this run
+                pending = (
+                    renderer.submit(self.__render_run, file_byte, runs[run_idx + 1], output_folder)
+                    if run_idx + 1 < len(runs) else None
+                )
+
+                first, last, _ = run
+                try:
+                    paths = current.result()  # type: ignore[union-attr]
+                except Exception as e:
+                    print(f'Lỗi chuyển trang {first}-{last} sang ảnh: {str(e)}')
+                    continue
+
+                for offset, path in enumerate(sorted(paths)):
+                    image = cv2.imread(path, read_flag)
+                    os.remove(path)
+                    if image is None:
+                        continue
+                    if not self.grayscale:
+                        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                    yield first - 1 + offset, image
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import os
 
+from fastapi import UploadFile
+
 from .base import BaseParserService
 from .base import ParserInput
 from .base import ParserOutput
@@ -15,8 +17,8 @@ class ParserService(BaseParserService):
         self.parser = Parser()
 
     async def process(self, input_data: ParserInput) -> ParserOutput:
-        extracted_text = self.extractor.extract(input_data.file)
-        raw_text = await self.parser.parse(extracted_text)
+        extracted_text = self.extract_text(input_data.file)
+        raw_text = await self.generate_markdown(extracted_text)
 
 
         _, ext = os.path.splitext(input_data.file.filename.lower())
@@ -25,3 +27,14 @@ class ParserService(BaseParserService):
             filename=input_data.file.filename,
             file_extension=ext,
         )
+
+    def extract_text(self, file: UploadFile) -> str:
+        """Extract the raw text of the file."""
+        return self.extractor.extract(file)
+
+    async def generate_markdown(self, extracted_text: str) -> str:
+        """Detect the header structure of extracted text and render it as Markdown."""
+        return await self.parser.parse(extracted_text)
+
+    def shutdown(self) -> None:
+        self.extractor.shutdown()
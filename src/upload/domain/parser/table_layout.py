@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+from .ocr import OcrWords
+
+CellBox = Tuple[int, int, int, int]  # x, y, w, h
+
+
+def assign_words_to_cells(words: OcrWords, cell_rows: List[List[CellBox]]) -> List[List[str]]:
+    """Distribute OCR word boxes over detected table cells.
+
+    Each word goes to the smallest cell containing its center; words inside a cell
+    are grouped into lines by vertical position and lines are joined with ``<br>``.
+    """
+    boxes = [box for row in cell_rows for box in row]
+    cell_words: List[List[int]] = [[] for _ in boxes]
+
+    if boxes and len(words):
+        cells = np.array(boxes, dtype=np.float32)
+        x0, y0 = cells[:, 0], cells[:, 1]
+        x1, y1 = x0 + cells[:, 2], y0 + cells[:, 3]
+
+        cx = words.left + words.width / 2
+        cy = words.top + words.height / 2
+
+        # (words x cells) containment matrix, then pick the tightest containing cell
+        inside = (
+            (cx[:, None] >= x0[None, :]) & (cx[:, None] < x1[None, :]) &
+            (cy[:, None] >= y0[None, :]) & (cy[:, None] < y1[None, :])
+        )
+        areas = np.where(inside, (cells[:, 2] * cells[:, 3])[None, :], np.inf)
+        best = np.argmin(areas, axis=1)
+        assigned = inside.any(axis=1)
+
+        # Reading order: top to bottom, then left to right
+        for word_idx in np.lexsort((words.left, words.top)):
+            if assigned[word_idx]:
+                cell_words[best[word_idx]].append(int(word_idx))
+
+    texts = [_join_lines(words, indices) for indices in cell_words]
+
+    table_data = []
+    position = 0
+    for row in cell_rows:
+        table_data.append(texts[position:position + len(row)])
+        position += len(row)
+    return table_data
+
+
+def _join_lines(words: OcrWords, indices: List[int]) -> str:
+    """Join the words of one cell, starting a new line once a word's center is below the current line."""
+    if not indices:
+        return ''
+
+    lines: List[List[int]] = []
+    line_bottom = 0.0
+    for idx in indices:
+        top = float(words.top[idx])
+        bottom = top + float(words.height[idx])
+        if lines and (top + bottom) / 2 < line_bottom:
+            lines[-1].append(idx)
+            line_bottom = max(line_bottom, bottom)
+        else:
+            lines.append([idx])
+            line_bottom = bottom
+
+    return '<br>'.join(
+        ' '.join(words.texts[idx] for idx in sorted(line, key=lambda i: words.left[i]))
+        for line in lines
+    )
@@ -0,0 +1,5 @@
+from __future__ import annotations
+
+from .extraction_cache import ExtractionCache
+
+__all__ = ['ExtractionCache']
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO
+from typing import Optional
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+EXTRACTION_CACHE_ENABLED = os.getenv('EXTRACTION_CACHE_ENABLED', 'true').lower() == 'true'
+EXTRACTION_CACHE_DIR = os.getenv('EXTRACTION_CACHE_DIR', '.cache/extraction')
+EXTRACTION_CACHE_MAX_MB = int(os.getenv('EXTRACTION_CACHE_MAX_MB', '1024'))
+# Bump whenever extraction, header detection or chunking output changes
+PIPELINE_VERSION = os.getenv('PIPELINE_VERSION', '1')
+
+
+class ExtractionCache:
+    """Content-addressed local disk cache for the outputs of the upload pipeline stages.
+
+    Entries are keyed by the SHA-256 of the uploaded bytes plus the pipeline version and
+    stored as one file per stage (``extracted``, ``markdown``, ``chunks``). The least
+    recently used files are evicted once the cache grows beyond ``max_mb``.
+    """
+
+    STAGES = ('extracted', 'markdown', 'chunks')
+
+    def __init__(
+        self,
+        cache_dir: str = EXTRACTION_CACHE_DIR,
+        max_mb: int = EXTRACTION_CACHE_MAX_MB,
+        pipeline_version: str = PIPELINE_VERSION,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.pipeline_version = pipeline_version
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, file: BinaryIO) -> str:
+        """Hash the file content in blocks, leaving the file positioned at the start."""
+        digest = hashlib.sha256()
+        file.seek(0)
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+        file.seek(0)
+        return f'{digest.hexdigest()}-v{self.pipeline_version}'
+
+    def __path(self, key: str, stage: str) -> str:
+        if stage not in self.STAGES:
+            raise ValueError(f'Unknown cache stage: {stage}')
+        return os.path.join(self.cache_dir, f'{key}.{stage}')
+
+    def get(self, key: str, stage: str) -> Optional[str]:
+        path = self.__path(key, stage)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = f.read()
+            # Mark as recently used for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f'Failed to read extraction cache {path}: {e}')
+            return None
+
+        logger.info('Extraction cache hit', key=key, stage=stage)
+        return value
+
+    def put(self, key: str, stage: str, value: str) -> None:
+        path = self.__path(key, stage)
+        try:
+            # Write to a temp file then rename, so concurrent workers never read partial entries
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f'Failed to write extraction cache {path}: {e}')
+            return
+
+        self.__evict()
+
+    def __evict(self) -> None:
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.endswith('.tmp'):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        if total_size <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            if total_size <= self.max_bytes:
+                break
@@ -13,6 +13,8 @@ from domain.embedder import OpenSearchStorage
 from domain.parser import ParserService
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from infra.cache import ExtractionCache
+from infra.cache.extraction_cache import EXTRACTION_CACHE_ENABLED
 from shared.logging import get_logger
 from shared.logging import setup_logging
 
@@ -35,8 +37,12 @@ async def lifespan(app: FastAPI):
     app.state.parser = parser
     app.state.chunker = chunker
     app.state.embedder = embedder
+    app.state.extraction_cache = ExtractionCache() if EXTRACTION_CACHE_ENABLED else None
     logger.info('Domain services initialized successfully')
     yield
+    parser.shutdown()
+    chunker.shutdown()
+    embedder.shutdown()
 
 app = FastAPI(
     title='Document Upload Service',
@@ -66,6 +72,12 @@ def root():
     }
 
 
+@app.get('/metrics/embedding')
+def embedding_metrics():
+    """Embedding request, retry and failure counts plus the adaptive limiter state."""
+    return app.state.embedder.embedding_generator.metrics()
+
+
 if __name__ == '__main__':
     uvicorn.run(
         'main:app',
@@ -0,0 +1,5 @@
+from __future__ import annotations
+
+from .source_text import SourceTextModel
+
+__all__ = ['SourceTextModel']
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from pydantic import BaseModel
+from pydantic import PrivateAttr
+
+
+class SourceTextModel(BaseModel):
+    """Model whose text can be a ``[start, end)`` span of a shared source buffer.
+
+    Subclasses declare ``content``, ``start`` and ``end``. ``content`` is left empty
+    when the text is exactly the source slice and is only materialized through
+    :attr:`text`; the source itself is never serialized.
+    """
+    _source: Optional[str] = PrivateAttr(default=None)
+
+    def attach_source(self, source: Optional[str]) -> None:
+        self._source = source
+
+    @property
+    def source(self) -> Optional[str]:
+        return self._source
+
+    @property
+    def text(self) -> str:
+        content = getattr(self, 'content', None)
+        if content is not None:
+            return content
+        if self._source is None or self.start is None or self.end is None:  # type: ignore[attr-defined]
+            raise ValueError('Text has neither content nor a source span')
+        return self._source[self.start:self.end]  # type: ignore[attr-defined]
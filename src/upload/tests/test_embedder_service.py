@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from domain.embedder.base import BaseEmbeddingGenerator
+from domain.embedder.base import BaseStorage
+from domain.embedder.base import ChunkData
+from domain.embedder.base import EmbedderInput
+from domain.embedder.service import EmbedderService
+
+
+class FakeGenerator(BaseEmbeddingGenerator):
+    max_batch_size = 8
+
+    def __init__(self, fail_on: Optional[str] = None):
+        super().__init__()
+        self.fail_on = fail_on
+
+    async def embed_request(self, texts: List[str]) -> List[List[float]]:
+        if self.fail_on is not None and self.fail_on in texts:
+            raise RuntimeError('model error')
+        return [[float(len(text))] for text in texts]
+
+
+class FakeStorage(BaseStorage):
+    index_name = 'chunks'
+
+    def __init__(self):
+        self.documents: Dict[str, ChunkData] = {}
+        self.writes = 0
+
+    def test_connection(self) -> bool:
+        return True
+
+    def create_optimized_index(self) -> None:
+        pass
+
+    def bulk_index_chunks(
+        self,
+        chunks: List[ChunkData],
+        embeddings: Dict[int, List[float]],
+        refresh: bool = True,
+        upload_id: Optional[str] = None,
+    ) -> None:
+        self.writes += 1
+        for idx, chunk in enumerate(chunks):
+            if idx in embeddings:
+                self.documents[self.document_id(chunk, upload_id)] = chunk
+
+    def delete_chunks(self, ids: List[str]) -> None:
+        for chunk_id in ids:
+            self.documents.pop(chunk_id, None)
+
+
+def _chunks(filename: str, count: int) -> List[ChunkData]:
+    return [
+        ChunkData(id=idx, content=f'Đoạn {idx} của {filename}', filename=filename, section_title='Mục')
+        for idx in range(count)
+    ]
+
+
+def _embed(service: EmbedderService, chunks: List[ChunkData], batch_size: int):
+    async def _stream():
+        for chunk in chunks:
+            yield chunk
+
+    return asyncio.run(service.process_stream(_stream(), batch_size=batch_size))
+
+
+def test_process_indexes_every_chunk():
+    storage = FakeStorage()
+    service = EmbedderService(FakeGenerator(), storage)
+
+    output = asyncio.run(service.process(EmbedderInput(chunks=_chunks('a.pdf', 5), metadata={})))
+
+    assert output.index_name == 'chunks'
+    assert output.num_embeddings == 5
+    assert len(storage.documents) == 5
+
+
+def test_failed_reupload_keeps_earlier_upload_of_same_file(monkeypatch):
+    monkeypatch.setattr('domain.embedder.service.EMBEDDING_INDEX_FLUSH_SIZE', 2)
+    storage = FakeStorage()
+    chunks = _chunks('hop_dong.pdf', 6)
+
+    first = _embed(EmbedderService(FakeGenerator(), storage), chunks, batch_size=2)
+    assert first.num_embeddings == 6
+    earlier = dict(storage.documents)
+    writes = storage.writes
+
+    # The last batch fails after the first ones were flushed
+    failing = EmbedderService(FakeGenerator(fail_on=chunks[5].text), storage)
+    second = _embed(failing, chunks, batch_size=2)
+
+    assert second.index_name is None
+    assert storage.writes > writes
+    assert storage.documents == earlier
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List
+from typing import Tuple
+
+from domain.parser.parser import Parser
+
+RAW_TEXT = '\n'.join([
+    'HỢP ĐỒNG DỊCH VỤ VẬN CHUYỂN',
+    'A. Phạm vi áp dụng',
+    'Hợp đồng này áp dụng cho mọi lô hàng giữa hai bên.',
+    'B. Thanh toán',
+    'Bên B thanh toán trong vòng 30 ngày kể từ ngày nhận hoá đơn.',
+])
+
+
+class GarbageGenerator:
+    def __init__(self):
+        self.windows = 0
+
+    async def generate_line_headers(self, window: List[Tuple[int, str]]) -> str:
+        self.windows += 1
+        return 'Xin lỗi, tôi không thể trả lời yêu cầu này.'
+
+
+def test_windowed_falls_back_to_basic_markdown_when_no_window_parses():
+    parser = Parser(region_name='us-east-1', header_mode='windowed', window_lines=2, window_overlap=0, rules_enabled=False)
+    parser.generator = GarbageGenerator()
+
+    markdown = asyncio.run(parser.parse(RAW_TEXT))
+
+    assert parser.generator.windows > 1
+    assert markdown == parser._format_as_basic_markdown(RAW_TEXT)
+    assert '## A. Phạm vi áp dụng' in markdown.split('\n')